@@ -1,5 +1,5 @@
 import dash
-from dash.dependencies import Input, Output, State
+from dash.dependencies import Input, Output, State, ClientsideFunction
 import dash_core_components as dcc
 import dash_html_components as html
 import dash_daq as daq
@@ -9,25 +9,604 @@ from dash_table.Format import Format, Scheme
 from dash.exceptions import PreventUpdate
 import plotly.graph_objects as go
 import plotly.io as pio
+from plotly.utils import PlotlyJSONEncoder
 from plotly.subplots import make_subplots
 import pandas as pd
 import numpy as np
 import re
+import string
+import bisect
+import zlib
+import openpyxl
+import sys
+import collections
 import urllib.parse
 import requests
-from io import StringIO
+import os
+import hashlib
+import hmac
+import json
+import tempfile
+import io
+import threading
+import time
+import contextlib
+import functools
+import flask
+from concurrent.futures import ThreadPoolExecutor, Future
 
 #creates a re-usable session object with your creds in-built
 github_session = requests.Session()
+#bounded pool for concurrent downloads; the session keeps a connection per worker
+fetch_workers = int(os.environ.get("TAMMA_FETCH_WORKERS", 8))
+fetch_executor = ThreadPoolExecutor(max_workers=fetch_workers)
+github_session.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=fetch_workers))
+github_session.mount("https://", requests.adapters.HTTPAdapter(pool_maxsize=fetch_workers))
+#connect and read timeouts of the downloads, in seconds: an unresponsive data repository fails the download instead of blocking the worker
+fetch_timeout = (5, 30)
+
+#data repository: any server with the same layout as raw.githubusercontent.com (e.g. a local file server) can stand in for it,
+#as well as an s3 bucket with the same layout (s3://<bucket>/<prefix>/) or a local checkout of the data release (a directory)
+data_repository_url = os.environ.get("TAMMA_DATA_URL", "https://raw.githubusercontent.com/Humanitas-Danese-s-omics/ibd-meta-analysis-data/")
+if data_repository_url.startswith(("http://", "https://")):
+	data_backend = "http"
+elif data_repository_url.startswith("s3://"):
+	data_backend = "s3"
+	#boto3 is only needed for s3 data repositories
+	import boto3
+	import botocore
+	import botocore.config
+	import botocore.exceptions
+	s3_bucket, _, s3_prefix = data_repository_url[len("s3://"):].partition("/")
+	#endpoint of an s3-compatible store (e.g. minio), aws if unset; credentials are the usual aws ones, public buckets are read anonymously
+	s3_config = botocore.config.Config(max_pool_connections=fetch_workers)
+	if boto3.Session().get_credentials() is None:
+		s3_config = s3_config.merge(botocore.config.Config(signature_version=botocore.UNSIGNED))
+	s3_client = boto3.client("s3", endpoint_url=os.environ.get("TAMMA_S3_ENDPOINT_URL"), config=s3_config)
+else:
+	data_backend = "local"
+	#local files are read in place and never copied to the cache dir
+	data_repository_dir = data_repository_url[len("file://"):] if data_repository_url.startswith("file://") else data_repository_url
+#branch, tag or commit of the data repository; a full commit sha pins the data release and cached files are never revalidated
+data_release = os.environ.get("TAMMA_DATA_RELEASE", "main")
+data_release_pinned = re.fullmatch(r"[0-9a-f]{40}", data_release) is not None
+#on-disk mirror of the data repository
+cache_dir = os.environ.get("TAMMA_CACHE_DIR", os.path.join(tempfile.gettempdir(), "tamma_cache"))
+#seconds before a cached file is revalidated with its ETag
+cache_revalidate_after = float(os.environ.get("TAMMA_CACHE_REVALIDATE_AFTER", 300))
+#figures prebuilt by prebuild_figures.py, one json file per panel and data release
+artifacts_dir = os.environ.get("TAMMA_ARTIFACTS_DIR")
+#callback instrumentation: metrics exposed at /metrics and optional log line per callback
+metrics_enabled = os.environ.get("TAMMA_METRICS", "0") != "0"
+callback_log_enabled = os.environ.get("TAMMA_CALLBACK_LOG", "0") != "0"
+#token of the reload route, disabled when unset
+reload_token = os.environ.get("TAMMA_RELOAD_TOKEN")
+#compression of the callback, layout and asset responses: encodings in order of preference, minimum size and levels
+compression_encodings = [encoding.strip() for encoding in os.environ.get("TAMMA_COMPRESSION", "br,gzip").split(",") if encoding.strip() in ["br", "gzip"]]
+compression_min_bytes = int(os.environ.get("TAMMA_COMPRESSION_MIN_BYTES", 1024))
+compression_levels = {"gzip": int(os.environ.get("TAMMA_GZIP_LEVEL", 6)), "br": int(os.environ.get("TAMMA_BROTLI_QUALITY", 4))}
+#brotli is optional, responses are only gzip-compressed without it
+try:
+	import brotli
+except ImportError:
+	brotli = None
+	if "br" in compression_encodings:
+		compression_encodings.remove("br")
+
+#time spent by the current thread in each phase of an instrumented callback (fetch, parse), None outside callbacks
+#work done in the fetch pool threads is not split and counts as compute
+callback_phases = threading.local()
+
+#context manager adding the time spent in its block to a phase, without the time spent in nested phases
+@contextlib.contextmanager
+def phase_timer(phase):
+	totals = getattr(callback_phases, "totals", None)
+	if totals is None:
+		yield
+		return
+	start = time.perf_counter()
+	callback_phases.stack.append(0.0)
+	try:
+		yield
+	finally:
+		elapsed = time.perf_counter() - start
+		nested = callback_phases.stack.pop()
+		totals[phase] = totals.get(phase, 0.0) + elapsed - nested
+		if len(callback_phases.stack) > 0:
+			callback_phases.stack[-1] += elapsed
+
+#decorator timing a whole function as a phase
+def timed_phase(phase):
+	def decorator(function):
+		@functools.wraps(function)
+		def timed_function(*args, **kwargs):
+			with phase_timer(phase):
+				return function(*args, **kwargs)
+		return timed_function
+	return decorator
+
+#in-memory copy of the cache refs (file -> etag, content hash, last check)
+cache_refs = {}
+cache_refs_lock = threading.Lock()
+
+#function to write a file atomically, so that concurrent workers never read a partial file
+def write_file_atomically(path, content):
+	os.makedirs(os.path.dirname(path), exist_ok=True)
+	fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+	with os.fdopen(fd, "wb") as tmp_file:
+		tmp_file.write(content)
+	os.replace(tmp_path, path)
+
+#cache objects are content-addressed by their sha256
+def get_cache_object_path(digest):
+	return os.path.join(cache_dir, "objects", digest[0:2], digest[2:])
+
+def get_cache_ref_path(file_url):
+	return os.path.join(cache_dir, "refs", data_release, file_url + ".json")
+
+#function to get the cache ref of a file, from memory or from disk
+def get_cache_ref(file_url):
+	with cache_refs_lock:
+		ref = cache_refs.get(file_url)
+	if ref is None:
+		try:
+			with open(get_cache_ref_path(file_url)) as ref_file:
+				ref = json.load(ref_file)
+		except (OSError, ValueError):
+			return None
+		with cache_refs_lock:
+			cache_refs[file_url] = ref
+	#the object may have been removed from the cache dir
+	if ref["object"] is not None and not os.path.isfile(get_cache_object_path(ref["object"])):
+		return None
+
+	return ref
+
+def set_cache_ref(file_url, ref):
+	with cache_refs_lock:
+		cache_refs[file_url] = ref
+	write_file_atomically(get_cache_ref_path(file_url), json.dumps(ref).encode("utf-8"))
+
+#function to store a downloaded file in the cache dir, streamed so that big files are never fully in memory
+def store_cache_object(chunks):
+	os.makedirs(os.path.join(cache_dir, "objects"), exist_ok=True)
+	fd, tmp_path = tempfile.mkstemp(dir=os.path.join(cache_dir, "objects"))
+	sha256 = hashlib.sha256()
+	try:
+		with os.fdopen(fd, "wb") as tmp_file:
+			for chunk in chunks:
+				sha256.update(chunk)
+				tmp_file.write(chunk)
+	except BaseException:
+		os.remove(tmp_path)
+		raise
+	digest = sha256.hexdigest()
+	os.makedirs(os.path.dirname(get_cache_object_path(digest)), exist_ok=True)
+	os.replace(tmp_path, get_cache_object_path(digest))
+
+	return digest
+
+#functions to download a file of a remote data repository unless it still has the cached etag
+#they return None if the file is not modified, otherwise its new etag and cache object, both None if the file does not exist
+def download_http(file_url, etag):
+	headers = {}
+	if etag is not None:
+		headers["If-None-Match"] = etag
+	with github_session.get(data_repository_url + data_release + "/" + file_url, headers=headers, stream=True, timeout=fetch_timeout) as response:
+		if response.status_code == 304:
+			return None
+		#missing files are remembered too, so that optional files are not requested every time
+		if response.status_code == 404:
+			return {"etag": None, "object": None}
+		response.raise_for_status()
+
+		return {"etag": response.headers.get("ETag"), "object": store_cache_object(response.iter_content(chunk_size=1024 * 1024))}
+
+def download_s3(file_url, etag):
+	kwargs = {}
+	if etag is not None:
+		kwargs["IfNoneMatch"] = etag
+	try:
+		response = s3_client.get_object(Bucket=s3_bucket, Key=s3_prefix + data_release + "/" + file_url, **kwargs)
+	except botocore.exceptions.ClientError as error:
+		status_code = error.response["ResponseMetadata"]["HTTPStatusCode"]
+		if status_code == 304:
+			return None
+		if status_code == 404:
+			return {"etag": None, "object": None}
+		raise
+	except botocore.exceptions.BotoCoreError as error:
+		raise ConnectionError(error) from error
+	with contextlib.closing(response["Body"]):
+		return {"etag": response["ETag"], "object": store_cache_object(response["Body"].iter_chunks(chunk_size=1024 * 1024))}
+
+remote_downloads = {"http": download_http, "s3": download_s3}
+
+#calls in flight by key: concurrent calls with the same key wait for the first one and share its result or error
+single_flight_calls = {}
+single_flight_lock = threading.Lock()
+single_flight_stats = {"coalesced": 0}
+
+def single_flight(key, function):
+	with single_flight_lock:
+		future = single_flight_calls.get(key)
+		if future is not None:
+			single_flight_stats["coalesced"] += 1
+		else:
+			single_flight_calls[key] = Future()
+	if future is not None:
+		return future.result()
+
+	future = single_flight_calls[key]
+	try:
+		result = function()
+	except BaseException as error:
+		future.set_exception(error)
+		raise
+	else:
+		future.set_result(result)
+	finally:
+		with single_flight_lock:
+			del single_flight_calls[key]
+
+	return result
+
+#function to download a file if it changed since its cache ref and update the ref
+def update_cache_ref(file_url, ref):
+	try:
+		download = remote_downloads[data_backend](file_url, None if ref is None else ref["etag"])
+	except (requests.RequestException, ConnectionError):
+		#data repository not reachable: serve the cached copy if there is one, and try again only after the usual delay
+		if ref is None:
+			raise
+		download = None
+	if download is None:
+		ref = dict(ref, checked=time.time())
+	else:
+		ref = dict(download, checked=time.time())
+	set_cache_ref(file_url, ref)
+
+	return ref
+
+#function to get the up-to-date cache ref of a file of a remote data repository, downloading it if needed
+def revalidate_cache_ref(file_url, force=False):
+	ref = get_cache_ref(file_url)
+
+	#revalidate only if the release is not pinned and the last check is too old
+	if ref is None or not data_release_pinned and (force or time.time() - ref["checked"] > cache_revalidate_after):
+		#concurrent requests of the same file share one download
+		ref = single_flight(("download", file_url), lambda: update_cache_ref(file_url, ref))
+
+	return ref
+
+#function to get the current version of a file, None if the file does not exist
+#the version of a remote file is the hash of its content, the one of a local file changes with its modification time and size
+@timed_phase("fetch")
+def get_file_version(file_url, force=False):
+	if data_backend == "local":
+		try:
+			stat = os.stat(os.path.join(data_repository_dir, file_url))
+		except FileNotFoundError:
+			return None
+		return "{:x}-{:x}".format(stat.st_mtime_ns, stat.st_size)
+
+	return revalidate_cache_ref(file_url, force)["object"]
+
+#versions of the files read by the current thread, recorded while building derived data
+data_reads = threading.local()
+
+def get_data_version(file_url):
+	version = get_file_version(file_url)
+	if getattr(data_reads, "versions", None) is not None:
+		data_reads.versions[file_url] = version
+
+	return version
+
+#function to get the path of a version of a file, to be parsed or memory-mapped in place: a cache object for remote files, the file itself for local ones
+def get_data_path(file_url, version):
+	if version is None:
+		raise FileNotFoundError(file_url)
+	if data_backend == "local":
+		return os.path.join(data_repository_dir, file_url)
+
+	return get_cache_object_path(version)
+
+#process-wide LRU of parsed data, bounded by memory
+data_cache = collections.OrderedDict()
+data_cache_lock = threading.Lock()
+data_cache_max_bytes = float(os.environ.get("TAMMA_DATA_CACHE_MB", 512)) * 1024 * 1024
+data_cache_stats = {"hits": 0, "misses": 0, "evictions": 0, "bytes": 0}
+
+#function to estimate the memory used by a cached object
+def get_object_size(obj):
+	if isinstance(obj, pd.DataFrame):
+		size = int(obj.memory_usage(index=True, deep=True).sum())
+	#memory-mapped arrays are in the page cache, not in the process memory
+	elif isinstance(obj, np.memmap):
+		size = sys.getsizeof(obj)
+	elif isinstance(obj, np.ndarray):
+		size = obj.nbytes
+	elif isinstance(obj, dict):
+		size = sum([get_object_size(value) for value in obj.values()])
+	elif isinstance(obj, (list, tuple)):
+		size = sum([get_object_size(value) for value in obj])
+	else:
+		size = sys.getsizeof(obj)
+
+	return size
+
+#get an object from the LRU, None if missing
+def data_cache_get(key):
+	with data_cache_lock:
+		if key in data_cache:
+			data_cache.move_to_end(key)
+			data_cache_stats["hits"] += 1
+			return data_cache[key][0]
+		data_cache_stats["misses"] += 1
+
+	return None
+
+#put an object in the LRU evicting the least recently used ones
+def data_cache_put(key, obj):
+	size = get_object_size(obj)
+	#too big to be cached
+	if size > data_cache_max_bytes:
+		return
+	with data_cache_lock:
+		if key in data_cache:
+			data_cache_stats["bytes"] -= data_cache.pop(key)[1]
+		while data_cache and data_cache_stats["bytes"] + size > data_cache_max_bytes:
+			evicted_key, evicted = data_cache.popitem(last=False)
+			data_cache_stats["bytes"] -= evicted[1]
+			data_cache_stats["evictions"] += 1
+		data_cache[key] = (obj, size)
+		data_cache_stats["bytes"] += size
+
+#function to get data derived from many files, built once and reused until one of the files it read changes
+#the prebuilt artifact is used when there is an up-to-date one
+def get_derived_data(key, build, artifact_name=None):
+	cached = data_cache_get(key)
+	if cached is not None:
+		obj, versions = cached
+		if all([get_data_version(file_url) == version for file_url, version in versions.items()]):
+			return obj
+
+	def build_derived_data():
+		artifact = None
+		if artifact_name is not None:
+			artifact = load_artifact(artifact_name)
+		if artifact is not None:
+			obj, versions = artifact
+		else:
+			obj, versions = record_data_reads(build)
+		data_cache_put(key, (obj, versions))
+		return obj, versions
+
+	#concurrent requests share one build, the files it read are recorded for all of them
+	obj, versions = single_flight(key, build_derived_data)
+	if getattr(data_reads, "versions", None) is not None:
+		data_reads.versions.update(versions)
+
+	return obj
+
+#function to run build and get the versions of the files it read, nested builds add their files to the outer one
+def record_data_reads(build):
+	outer_versions = getattr(data_reads, "versions", None)
+	data_reads.versions = {}
+	try:
+		obj = build()
+	finally:
+		versions = data_reads.versions
+		data_reads.versions = outer_versions
+	if outer_versions is not None:
+		outer_versions.update(versions)
+
+	return obj, versions
+
+def get_artifact_path(directory, name):
+	return os.path.join(directory, data_release, name + ".json")
+
+#function to load a prebuilt artifact as data and versions of the files it was built from, None if missing or out-of-date
+def load_artifact(name):
+	if artifacts_dir is None:
+		return None
+	try:
+		with open(get_artifact_path(artifacts_dir, name)) as artifact_file:
+			artifact = json.load(artifact_file)
+	except (OSError, ValueError):
+		return None
+	#a pinned release never changes, otherwise the files must still have the versions the artifact was built from
+	if data_release_pinned:
+		return artifact["data"], {}
+	if not all([get_data_version(file_url) == version for file_url, version in artifact["versions"].items()]):
+		return None
+
+	return artifact["data"], artifact["versions"]
+
+def save_artifact(directory, name, data, versions):
+	write_file_atomically(get_artifact_path(directory, name), json.dumps({"versions": versions, "data": data}).encode("utf-8"))
+
+#function to get data that depends only on the data release, from its prebuilt artifact or built now
+def get_prebuilt(name, build):
+	artifact = load_artifact(name)
+	if artifact is not None:
+		return artifact[0]
+
+	return build()
+
+#function to convert dash components and figures to plain json data, cheaper to cache and to send again
+def to_json_data(obj):
+	return json.loads(json.dumps(obj, cls=PlotlyJSONEncoder))
+
+#read_csv arguments that can be applied to a feather file too
+binary_read_kwargs = ["dtype", "low_memory"]
+
+#function to get the tsv files that have a feather file, listed by convert_data.py in feather_list.tsv
+#without the list no feather file is looked for, so a repository without them costs one missing file and not one per table
+def get_feather_files():
+	version = get_data_version("feather_list.tsv")
+	if version is None:
+		return set()
+	key = ("feather_files", version)
+	feather_files = data_cache_get(key)
+	if feather_files is None:
+		feather_files = set(read_tsv("feather_list.tsv", header=None, names=["file"], copy=False)["file"])
+		data_cache_put(key, feather_files)
+
+	return feather_files
+
+#function to get the file a table is read from and its version: the feather file made by convert_data.py if there is one, otherwise the tsv
+def get_table_source(file_url, **kwargs):
+	if file_url.endswith(".tsv") and all([kwarg in binary_read_kwargs for kwarg in kwargs]) and file_url in get_feather_files():
+		binary_url = file_url[:-len(".tsv")] + ".feather"
+		version = get_data_version(binary_url)
+		if version is not None:
+			return binary_url, version
+
+	return file_url, get_data_version(file_url)
+
+#function to parse a table from its source file and put it in the LRU
+@timed_phase("parse")
+def parse_table(file_url, source_url, version, key, **kwargs):
+	if source_url != file_url:
+		#feather files are read in place, with the dtypes stored by the converter
+		df = pd.read_feather(get_data_path(source_url, version))
+		if "dtype" in kwargs:
+			df = df.astype({column: dtype for column, dtype in kwargs["dtype"].items() if column in df.columns})
+	else:
+		df = pd.read_csv(get_data_path(file_url, version), sep="\t", **kwargs)
+	data_cache_put(key, df)
+
+	return df
+
+#function for reading a tsv of the data repository as a pandas df, parsed once per data version
+def read_tsv(file_url, copy=True, **kwargs):
+	source_url, version = get_table_source(file_url, **kwargs)
+	key = ("tsv", source_url, version, repr(sorted(kwargs.items())))
+	df = data_cache_get(key)
+	if df is None:
+		#concurrent requests of the same table share one parse
+		df = single_flight(key, lambda: parse_table(file_url, source_url, version, key, **kwargs))
+
+	#the cached df is shared by all callbacks: return a copy unless the caller only reads it
+	if copy:
+		df = df.copy()
+
+	return df
+
+#metadata is loaded once per data version in a single typed df shared by all callbacks
+metadata_store = {"version": None, "df": None, "discrete_columns": set()}
+metadata_store_lock = threading.Lock()
+#continuous metadata, every other column but sample is categorical
+metadata_dtypes = {"sample": str, "age": float, "age_at_diagnosis": float}
+
+#function to get the shared metadata df, reloaded only when metadata.tsv changes
+def load_metadata():
+	version = get_table_source("metadata.tsv", dtype=metadata_dtypes)[1]
+	if metadata_store["version"] != version:
+		with metadata_store_lock:
+			if metadata_store["version"] != version:
+				metadata_df = read_tsv("metadata.tsv", dtype=metadata_dtypes)
+				discrete_columns = set()
+				#text columns are object or str dtype depending on the pandas version and on the source file, feather or tsv
+				for column in metadata_df.columns:
+					if column != "sample" and not pd.api.types.is_numeric_dtype(metadata_df[column]):
+						metadata_df[column] = metadata_df[column].astype("category")
+						discrete_columns.add(column)
+				metadata_store.update(df=metadata_df, discrete_columns=discrete_columns, version=version)
+
+	return metadata_store["df"]
+
+#function to get a copy of the metadata with plain columns, as parsed from the tsv
+def get_metadata():
+	metadata_df = load_metadata()
+	discrete_columns = metadata_store["discrete_columns"]
+
+	return metadata_df.astype({column: object for column in metadata_df.columns if column in discrete_columns})
+
+#function to get a short hash of the version of the metadata, for the clients to know when their copy is stale
+def get_metadata_version():
+	version = get_table_source("metadata.tsv", dtype=metadata_dtypes)[1]
+
+	return hashlib.sha256(json.dumps(["metadata", version]).encode("utf-8")).hexdigest()[:16]
+
+#function to get the sample metadata of the umap hovers, built once per metadata version and sent once per browser session:
+#the umap points carry only the index of their sample in it
+def get_sample_metadata_lookup():
+	version = get_metadata_version()
+	key = ("sample_metadata_lookup", version)
+	lookup = data_cache_get(key)
+	if lookup is None:
+		metadata_df = get_metadata()
+		columns = [column for column in metadata_df.columns if column not in ["raw_counts", "kraken2", "control"]]
+		rows = metadata_df[columns].astype(object)
+		rows = rows.where(rows.notna(), "NA")
+		lookup = {"version": version, "columns": [label_to_value.get(column, column) for column in columns], "rows": rows.values.tolist()}
+		data_cache_put(key, lookup)
+
+	return lookup
+
+#function to get the index of samples in the sample metadata lookup, -1 for samples without metadata
+def get_sample_ids(samples):
+	metadata_df = load_metadata()
+	sample_ids = pd.Series(np.arange(len(metadata_df)), index=metadata_df["sample"].to_numpy())
+	sample_ids = sample_ids[~sample_ids.index.duplicated()]
+
+	return pd.Series(samples).map(sample_ids).fillna(-1).astype(int).to_numpy()
+
+#discrete metadata are colored by category, the others with a colorscale
+def is_discrete_metadata(column):
+	load_metadata()
+
+	return column in metadata_store["discrete_columns"]
+
+#function to reload the metadata when the data repository changes, without waiting for the revalidation
+#feather_list.tsv is revalidated first, it tells whether the metadata is read from metadata.feather or metadata.tsv
+def reload_metadata():
+	get_file_version("feather_list.tsv", force=True)
+	get_file_version("metadata.tsv", force=True)
+	if "metadata.tsv" in get_feather_files():
+		get_file_version("metadata.feather", force=True)
+
+	return load_metadata()
+
+#function to get the gene by sample counts matrix of a dataset made by convert_data.py, None if the data repository has none
+def get_counts_matrix(dataset):
+	version = get_data_version("data/" + dataset + "/counts_matrix.npy")
+	if version is None:
+		return None
+	key = ("counts_matrix", dataset, version)
+	counts_matrix = data_cache_get(key)
+	if counts_matrix is None:
+		genes = read_tsv("data/" + dataset + "/counts_genes.tsv", copy=False)["gene"]
+		counts_matrix = {
+			#the matrix is memory-mapped from the cache dir, reading a gene only touches its row
+			"matrix": np.load(get_data_path("data/" + dataset + "/counts_matrix.npy", version), mmap_mode="r"),
+			"rows": dict(zip(genes, range(len(genes)))),
+			"samples": read_tsv("data/" + dataset + "/counts_samples.tsv", copy=False)["sample"].to_numpy()
+		}
+		data_cache_put(key, counts_matrix)
+
+	return counts_matrix
+
+#function to read the counts of a gene or species as a df like its counts tsv: a row of the counts matrix if there is one, otherwise the tsv
+def read_counts(dataset, gene):
+	counts_matrix = get_counts_matrix(dataset)
+	if counts_matrix is None or gene not in counts_matrix["rows"]:
+		return read_tsv("data/" + dataset + "/counts/" + gene + ".tsv")
+	counts = np.asarray(counts_matrix["matrix"][counts_matrix["rows"][gene]], dtype=float)
+	#samples without counts for this gene are not in its tsv
+	has_counts = ~np.isnan(counts)
+	counts = pd.DataFrame({"sample": counts_matrix["samples"][has_counts], "counts": counts[has_counts]})
 
-#function for downloading and importing in pandas df
-def download_from_github(file_url):
-	file_url = "https://raw.githubusercontent.com/Humanitas-Danese-s-omics/ibd-meta-analysis-data/main/" + file_url
-	download = github_session.get(file_url).content
-	#read the downloaded content and make a pandas dataframe
-	df_downloaded_data = StringIO(download.decode('utf-8'))
+	return counts
 
-	return df_downloaded_data
+#function to read the counts of many genes or species concurrently, as a long df with gene, sample and counts columns
+def read_counts_many(dataset, genes):
+	counts_list = fetch_executor.map(lambda gene: read_counts(dataset, gene), genes)
+	counts = pd.concat([counts.assign(gene=gene) for gene, counts in zip(genes, counts_list)], ignore_index=True)
+
+	return counts[["gene", "sample", "counts"]]
 
 #default template
 pio.templates.default = "simple_white"
@@ -61,8 +640,7 @@ expression_datasets_options = [{"label": "Human", "value": "human"},
 					{"label": "Viruses by species", "value": "viruses_species"}]
 
 #color by dropdown
-metadata_table = download_from_github("metadata.tsv")
-metadata_table = pd.read_csv(metadata_table, sep = "\t")
+metadata_table = get_metadata()
 metadata_umap_options = []
 label_to_value = {"sample": "Sample"}
 for column in metadata_table.columns:
@@ -96,64 +674,259 @@ new_evidence_options = [
 	{"label": "Mycome in IBD", "value": "mycome_ibd"}
 ]
 
-#snakey
-dataset_stats = download_from_github("manual/stats.tsv")
-dataset_stats = pd.read_csv(dataset_stats, sep="\t")
-labels = download_from_github("manual/labels_list.tsv")
-labels = pd.read_csv(labels, sep = "\t", header=None, names=["labels"])
-labels["labels"] = labels["labels"].dropna()
-labels = labels["labels"].str.replace("_UCB", "").str.replace("_Pfizer", "").tolist()
-
-snakey_fig = go.Figure(data=[go.Sankey(
-	node = dict(
-		pad = 15,
-		thickness = 20,
-		line = dict(color = "black", width = 0.5),
-		label = labels,
-		color = colors,
-		hoverinfo = "none"
-	),
-	link = dict(
-		source = dataset_stats["source"],
-		target = dataset_stats["target"],
-		value = dataset_stats["n"]
-	)
-)])
-snakey_fig.update_layout(margin=dict(l=0, r=0, t=20, b=20))
+#function to build the snakey figure
+def build_snakey_fig():
+	dataset_stats = read_tsv("manual/stats.tsv")
+	labels = read_tsv("manual/labels_list.tsv", header=None, names=["labels"])
+	labels["labels"] = labels["labels"].dropna()
+	labels = labels["labels"].str.replace("_UCB", "").str.replace("_Pfizer", "").tolist()
+
+	snakey_fig = go.Figure(data=[go.Sankey(
+		node = dict(
+			pad = 15,
+			thickness = 20,
+			line = dict(color = "black", width = 0.5),
+			label = labels,
+			color = colors,
+			hoverinfo = "none"
+		),
+		link = dict(
+			source = dataset_stats["source"],
+			target = dataset_stats["target"],
+			value = dataset_stats["n"]
+		)
+	)])
+	snakey_fig.update_layout(margin=dict(l=0, r=0, t=20, b=20))
+
+	return to_json_data(snakey_fig)
+
+#metadata columns shown in the metadata table and exported
+def get_metadata_table_columns(metadata_table):
+	return [column for column in metadata_table.columns if column not in ["raw_counts", "kraken2", "condition", "control"]]
+
+#function to get the metadata table as shown, with links to the studies, built once per metadata version
+def get_metadata_table():
+	key = ("metadata_table", get_table_source("metadata.tsv", dtype=metadata_dtypes)[1])
+	table = data_cache_get(key)
+	if table is None:
+		metadata_df = get_metadata()
+		table = metadata_df[get_metadata_table_columns(metadata_df)].copy()
+		table["source"] = ["[{}](".format(source.split("_")[0]) + str("https://www.ncbi.nlm.nih.gov/geo/query/acc.cgi?acc=") + source.split("_")[0] + ")" for source in table["source"]]
+		table = table.rename(columns=label_to_value).reset_index(drop=True)
+		data_cache_put(key, table)
+
+	return table, key
+
+#function to build the metadata table columns and the tissues, the rows are paged by the server
+def build_metadata_table():
+	metadata_table = get_metadata_table()[0]
+	metadata_table_columns = []
+	for column in metadata_table.columns:
+		if column != "Source":
+			metadata_table_columns.append({"name": column, "id": column})
+		else:
+			metadata_table_columns.append({"name": "Source", "id": "Source", "type": "text", "presentation": "markdown"}),
 
-#metadata table data
-metadata_table = download_from_github("metadata.tsv")
-metadata_table = pd.read_csv(metadata_table, sep = "\t")
-columns_to_keep = []
-for column in metadata_table.columns:
-	if column not in ["raw_counts", "kraken2", "condition", "control"]:
-		columns_to_keep.append(column)
-metadata_table = metadata_table[columns_to_keep]
-metadata_table["source"] = ["[{}](".format(source.split("_")[0]) + str("https://www.ncbi.nlm.nih.gov/geo/query/acc.cgi?acc=") + source.split("_")[0] + ")" for source in metadata_table["source"]]
-metadata_table = metadata_table.rename(columns=label_to_value)
-metadata_table_columns = []
-for column in columns_to_keep:
-	if column != "source":
-		metadata_table_columns.append({"name": column.replace("_", " ").capitalize(), "id": column.replace("_", " ").capitalize()})
-	else:
-		metadata_table_columns.append({"name": "Source", "id": "Source", "type": "text", "presentation": "markdown"}),
+	tissues = metadata_table["Tissue"].unique().tolist()
+	tissues.sort()
 
-metadata_table_data = metadata_table.to_dict("records")
-#create a downloadable tsv file forced to excel by extension
-metadata_table = download_from_github("metadata.tsv")
-metadata_table = pd.read_csv(metadata_table, sep = "\t")
-metadata_table = metadata_table[columns_to_keep]
-metadata_table = metadata_table.rename(columns=label_to_value)
-link = metadata_table.to_csv(index=False, encoding="utf-8", sep="\t")
-link = "data:text/tsv;charset=utf-8," + urllib.parse.quote(link)
+	return to_json_data({"columns": metadata_table_columns, "tissues": tissues})
 
-tissues = metadata_table["Tissue"].unique().tolist()
-tissues.sort()
+#snakey
+snakey_fig = get_prebuilt("snakey", build_snakey_fig)
+
+#metadata table data
+metadata_table = get_prebuilt("metadata_table", build_metadata_table)
+metadata_table_columns = metadata_table["columns"]
+tissues = metadata_table["tissues"]
 
 #layout
-app = dash.Dash(__name__, title="IBD TaMMA", external_stylesheets=[dbc.themes.FLATLY])
+#dash's own flask-compress is disabled, responses are compressed below
+app = dash.Dash(__name__, title="IBD TaMMA", external_stylesheets=[dbc.themes.FLATLY], compress=False)
 server = app.server
 
+#routes whose responses are compressed: callbacks, layout, component bundles and assets
+compressed_static_prefixes = tuple([app.config.routes_pathname_prefix + route for route in ["_dash-component-suites/", "assets/"]])
+compressed_prefixes = tuple([app.config.routes_pathname_prefix + route for route in ["_dash-update-component", "_dash-layout"]]) + compressed_static_prefixes
+compressed_mimetypes = ["application/json", "application/javascript", "text/javascript", "text/css", "text/html", "text/plain", "image/svg+xml"]
+
+#function to compress a response body with an encoding at the configured level
+def compress_body(body, encoding, level=None):
+	if level is None:
+		level = compression_levels[encoding]
+	if encoding == "br":
+		return brotli.compress(body, quality=level)
+	compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+	return compressor.compress(body) + compressor.flush()
+
+#the callback metrics are recorded before this hook, on the uncompressed responses
+@server.after_request
+def compress_response(response):
+	if len(compression_encodings) == 0 or not flask.request.path.startswith(compressed_prefixes):
+		return response
+	if response.status_code != 200 or response.mimetype not in compressed_mimetypes or "Content-Encoding" in response.headers:
+		return response
+	response.vary.add("Accept-Encoding")
+	encodings = [encoding for encoding in compression_encodings if encoding in flask.request.accept_encodings]
+	if len(encodings) == 0:
+		return response
+
+	#static files are sent as file wrappers
+	response.direct_passthrough = False
+	body = response.get_data()
+	if len(body) < compression_min_bytes:
+		return response
+	etag = response.get_etag()[0]
+	#static files are compressed once per version and kept in the LRU, keyed by path and etag, or by a hash of the file without etag:
+	#the query string is chosen by the client and never part of the key
+	if flask.request.path.startswith(compressed_static_prefixes):
+		key = ("compressed_static_file", flask.request.path, etag if etag is not None else hashlib.sha1(body).hexdigest(), encodings[0])
+		compressed_body = data_cache_get(key)
+		if compressed_body is None:
+			compressed_body = compress_body(body, encodings[0])
+			data_cache_put(key, compressed_body)
+	else:
+		compressed_body = compress_body(body, encodings[0])
+	#the compressed body is equivalent to the body, a weak etag still matches its revalidations
+	if etag is not None:
+		response.set_etag(etag, weak=True)
+	response.set_data(compressed_body)
+	response.headers["Content-Encoding"] = encodings[0]
+
+	return response
+
+#callback metrics: histograms of wall time by phase and of payload size by part, per callback and trigger
+metric_buckets = {
+	"tamma_callback_seconds": [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10],
+	"tamma_callback_bytes": [1000, 10000, 100000, 1000000, 10000000]
+}
+metric_help = {
+	"tamma_callback_seconds": "Wall time of the callbacks by phase: fetch, parse, compute and serialize (dash overhead and json encoding).",
+	"tamma_callback_bytes": "Size of the callback requests and responses by part: inputs, states and outputs."
+}
+callback_metrics = {}
+callback_metrics_lock = threading.Lock()
+
+#function to add an observation to a histogram
+def observe_metric(metric, labels, value):
+	key = (metric, tuple(sorted(labels.items())))
+	with callback_metrics_lock:
+		histogram = callback_metrics.get(key)
+		if histogram is None:
+			histogram = {"buckets": [0] * len(metric_buckets[metric]), "sum": 0.0, "count": 0}
+			callback_metrics[key] = histogram
+		for i, bound in enumerate(metric_buckets[metric]):
+			if value <= bound:
+				histogram["buckets"][i] += 1
+		histogram["sum"] += value
+		histogram["count"] += 1
+
+#function to render the metrics in prometheus text format
+def render_metrics():
+	def format_labels(labels):
+		return ",".join(['{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")) for name, value in labels])
+
+	lines = []
+	with callback_metrics_lock:
+		for metric in metric_buckets:
+			lines.append("# HELP {} {}".format(metric, metric_help[metric]))
+			lines.append("# TYPE {} histogram".format(metric))
+			for (key_metric, labels), histogram in sorted(callback_metrics.items()):
+				if key_metric != metric:
+					continue
+				for bound, count in zip(metric_buckets[metric], histogram["buckets"]):
+					lines.append("{}_bucket{{{},le=\"{}\"}} {}".format(metric, format_labels(labels), bound, count))
+				lines.append("{}_bucket{{{},le=\"+Inf\"}} {}".format(metric, format_labels(labels), histogram["count"]))
+				lines.append("{}_sum{{{}}} {}".format(metric, format_labels(labels), histogram["sum"]))
+				lines.append("{}_count{{{}}} {}".format(metric, format_labels(labels), histogram["count"]))
+	#data cache
+	lines.append("# HELP tamma_data_cache_bytes Estimated memory used by the data cache.")
+	lines.append("# TYPE tamma_data_cache_bytes gauge")
+	lines.append("tamma_data_cache_bytes {}".format(data_cache_stats["bytes"]))
+	lines.append("# HELP tamma_single_flight_coalesced_total Downloads, parses and builds that waited for an identical one in flight.")
+	lines.append("# TYPE tamma_single_flight_coalesced_total counter")
+	lines.append("tamma_single_flight_coalesced_total {}".format(single_flight_stats["coalesced"]))
+	for stat in ["hits", "misses", "evictions"]:
+		lines.append("# HELP tamma_data_cache_{}_total Data cache {}.".format(stat, stat))
+		lines.append("# TYPE tamma_data_cache_{}_total counter".format(stat))
+		lines.append("tamma_data_cache_{}_total {}".format(stat, data_cache_stats[stat]))
+
+	return "\n".join(lines) + "\n"
+
+#function to wrap app.callback: the decorated function records its wall time and the time spent fetching and parsing data
+def instrument_callback(callback):
+	@functools.wraps(callback)
+	def instrumented_callback(*args, **kwargs):
+		register = callback(*args, **kwargs)
+		def decorator(function):
+			@functools.wraps(function)
+			def instrumented_function(*function_args, **function_kwargs):
+				callback_phases.totals = {}
+				callback_phases.stack = []
+				start = time.perf_counter()
+				try:
+					return function(*function_args, **function_kwargs)
+				finally:
+					flask.g.callback_metrics = {"callback": function.__name__, "seconds": time.perf_counter() - start, "phases": callback_phases.totals}
+					callback_phases.totals = None
+			return register(instrumented_function)
+		return decorator
+	return instrumented_callback
+
+if metrics_enabled or callback_log_enabled:
+	app.callback = instrument_callback(app.callback)
+
+	@server.before_request
+	def start_callback_timer():
+		flask.g.request_start = time.perf_counter()
+
+	#the serialize phase is the time of the request not spent in the callback function
+	@server.after_request
+	def record_callback_metrics(response):
+		if "callback_metrics" not in flask.g:
+			return response
+		total = time.perf_counter() - flask.g.request_start
+		body = flask.request.get_json(silent=True) or {}
+		changed_props = body.get("changedPropIds") or ["."]
+		labels = {"callback": flask.g.callback_metrics["callback"], "trigger": changed_props[0]}
+		fetch = flask.g.callback_metrics["phases"].get("fetch", 0.0)
+		parse = flask.g.callback_metrics["phases"].get("parse", 0.0)
+		seconds = {
+			"fetch": fetch,
+			"parse": parse,
+			"compute": max(flask.g.callback_metrics["seconds"] - fetch - parse, 0.0),
+			"serialize": max(total - flask.g.callback_metrics["seconds"], 0.0)
+		}
+		sizes = {
+			"inputs": len(json.dumps(body.get("inputs", []))),
+			"states": len(json.dumps(body.get("state", []))),
+			"outputs": response.calculate_content_length() or 0
+		}
+		if metrics_enabled:
+			for phase, value in seconds.items():
+				observe_metric("tamma_callback_seconds", dict(labels, phase=phase), value)
+			for part, value in sizes.items():
+				observe_metric("tamma_callback_bytes", dict(labels, part=part), value)
+		if callback_log_enabled:
+			print("callback {} trigger={} total={:.1f}ms {} {}".format(labels["callback"], labels["trigger"], total * 1000, " ".join(["{}={:.1f}ms".format(phase, value * 1000) for phase, value in seconds.items()]), " ".join(["{}={}B".format(part, value) for part, value in sizes.items()])), file=sys.stderr)
+
+		return response
+
+if metrics_enabled:
+	@server.route("/metrics")
+	def metrics():
+		return flask.Response(render_metrics(), mimetype="text/plain; version=0.0.4")
+
+if reload_token:
+	@server.route("/reload", methods=["POST"])
+	def reload():
+		if not hmac.compare_digest(flask.request.headers.get("Authorization", ""), "Bearer " + reload_token):
+			flask.abort(403)
+		reload_metadata()
+
+		return flask.jsonify(metadata_version=get_metadata_version(), pid=os.getpid())
+
 #styles for tabs and selected tabs
 tab_style = {
 	"padding": 6, 
@@ -365,6 +1138,15 @@ app.layout = html.Div([
 				)
 			], style={"width": "53.5%", "height": 535, "display": "inline-block"}),
 
+			#height and trace visibility of the umaps, figures built by the server and zoom applied clientside
+			dcc.Store(id="umap_view"),
+			dcc.Store(id="umap_metadata_store"),
+			dcc.Store(id="umap_expression_store"),
+			dcc.Store(id="umap_zoom"),
+			#metadata of the samples for the umap hovers and its version, sent once per browser session
+			dcc.Store(id="sample_metadata_store", storage_type="session"),
+			dcc.Store(id="sample_metadata_version", storage_type="session"),
+
 			#MA-plot + boxplots + go plot
 			html.Div([
 				#MA-plot + boxplots
@@ -441,7 +1223,7 @@ app.layout = html.Div([
 						html.Br(),
 						dcc.Loading(
 							id = "loading_boxplots",
-							children = dcc.Graph(id="boxplots_graph", style={"height": 400}),
+							children = [dcc.Graph(id="boxplots_graph", style={"height": 400}), dcc.Store(id="boxplots_store"), dcc.Store(id="boxplots_legend_store")],
 							type = "dot",
 							color = "#33A02C"
 						),
@@ -477,6 +1259,7 @@ app.layout = html.Div([
 						#search bar
 						html.Div([
 							dcc.Input(id="go_plot_filter_input", type="search", placeholder="Type here to filter GO gene sets", size="30", debounce=True),
+							dcc.Store(id="go_filter"),
 						], style={"width": "35%", "display": "inline-block", "font-size": "12px", "vertical-align": "middle"})
 					], style={"width": "100%", "display": "inline-block", "vertical-align": "middle", "text-align": "right"}),
 
@@ -534,6 +1317,13 @@ app.layout = html.Div([
 						#update plot button
 						html.Div([
 							html.Button("Update plot", id="update_multixoplot_plot_button", style={"font-size": 12, "text-transform": "none", "font-weight": "normal", "background-image": "linear-gradient(-180deg, #FFFFFF 0%, #D9D9D9 100%)"}),
+							#download plotted data
+							html.A(
+								id="download_multiboxplots",
+								href="",
+								target="_blank",
+								children = [html.Button("Download data", id="download_multiboxplots_button", disabled=True, style={"font-size": 12, "text-transform": "none", "font-weight": "normal", "background-image": "linear-gradient(-180deg, #FFFFFF 0%, #D9D9D9 100%)"})]
+							),
 							#warning popup
 							dbc.Popover(
 								children=[
@@ -597,7 +1387,7 @@ app.layout = html.Div([
 						html.Div(
 							id="multi_boxplots_div",
 							children=[dcc.Loading(
-								children = [dcc.Graph(id="multi_boxplots_graph", figure={})],
+								children = [dcc.Graph(id="multi_boxplots_graph", figure={}), dcc.Store(id="multi_boxplots_store")],
 								type = "dot",
 								color = "#33A02C")
 						], hidden=True)
@@ -648,8 +1438,8 @@ app.layout = html.Div([
 						color = "#33A02C",
 						children=[html.A(
 							id="download_metadata",
-							href=link,
-							download="TaMMa_metadata.xls",
+							href=app.get_relative_path("/download/metadata?format=xlsx"),
+							download="TaMMa_metadata.xlsx",
 							target="_blank",
 							children = [html.Button("Download full table", id="download_metadata_button", style={"font-size": 12, "text-transform": "none", "font-weight": "normal", "background-image": "linear-gradient(-180deg, #FFFFFF 0%, #D9D9D9 100%)"})],
 							)
@@ -665,7 +1455,6 @@ app.layout = html.Div([
 						color="#33A02C",
 						children=dash_table.DataTable(
 							id="metadata_table",
-							filter_action="native",
 							style_filter={
 								"text-align": "left"
 							},
@@ -680,12 +1469,17 @@ app.layout = html.Div([
 								"text-align": "left"
 							},
 							page_size=25,
-							sort_action="native",
+							page_current=0,
+							page_action="custom",
+							sort_action="custom",
+							sort_mode="single",
+							sort_by=[],
+							filter_action="custom",
+							filter_query="",
 							style_header={
 								"text-align": "left"
 							},
 							style_as_list_view=True,
-							data = metadata_table_data,
 							columns = metadata_table_columns
 						)
 					)
@@ -755,6 +1549,13 @@ app.layout = html.Div([
 							)
 						], style={"width": "25%", "display": "inline-block", "vertical-align": "middle", 'color': 'black'}),
 
+						#all contrasts export, prepared in background
+						html.Div([
+							html.Button("Export all contrasts", id="download_diffexp_all_button", style={"font-size": 12, "text-transform": "none", "font-weight": "normal", "background-image": "linear-gradient(-180deg, #FFFFFF 0%, #D9D9D9 100%)"}),
+							html.A(id="download_diffexp_all", href="", target="_blank", hidden=True, children=["Download"], style={"font-size": 12, "margin-left": 5}),
+							dcc.Interval(id="download_diffexp_all_interval", interval=2000, disabled=True)
+						], style={"width": "20%", "display": "inline-block", "vertical-align": "middle", 'color': 'black'}),
+
 						#dropdown
 						html.Div([
 							dcc.Dropdown(id="multi_gene_dge_table_selection_dropdown", multi=True, placeholder="", style={"textAlign": "left", "font-size": "12px"})
@@ -810,7 +1611,13 @@ app.layout = html.Div([
 										"textAlign": "center"
 									},
 									page_size=25,
-									sort_action="native",
+									page_current=0,
+									page_action="custom",
+									sort_action="custom",
+									sort_mode="single",
+									sort_by=[],
+									filter_action="custom",
+									filter_query="",
 									style_header={
 										"textAlign": "center"
 									},
@@ -1031,38 +1838,73 @@ app.layout = html.Div([
 
 ### functions ###
 
-#go search function
-def serach_go(search_value, df):
-	#define search query if present
-	if search_value.endswith(" "):
-		search_value = search_value.rstrip()
-	search_query = re.split(r"[\s\-/,_]+", search_value)
-	search_query = [x.lower() for x in search_query]
-
-	#search keyword in processes
-	processes_to_keep = []
-	for process in df["Process~name"]:
-		#force lowecase
-		process_lower = process.lower()
-		#check each keyword
+#function to split a GO process name or a search query in lowercase words, without the punctuation around them, e.g. "(CD4+)" is "cd4"
+def split_go_words(text):
+	words = [word.strip(string.punctuation) for word in re.split(r"[\s\-/,_]+", text.lower())]
+
+	return [word for word in words if word != ""]
+
+#function to get the search index of the GO processes of a contrast: GO id map and inverted index of words, with sorted words for prefix search
+def get_go_index(contrast):
+	file_url = "data/human/padj_1e-10/" + contrast + ".merged_go.tsv"
+	key = ("go_index", file_url, get_table_source(file_url)[1])
+	go_index = data_cache_get(key)
+	if go_index is None:
+		processes = read_tsv(file_url, copy=False)["Process~name"].drop_duplicates().tolist()
+		go_ids = {}
+		postings = {}
+		for process_id, process in enumerate(processes):
+			go_id, name = process.split("~")[0:2]
+			go_ids.setdefault(go_id.lower(), set()).add(process_id)
+			for word in split_go_words(name):
+				postings.setdefault(word, set()).add(process_id)
+		words = sorted(postings)
+		go_index = {
+			"source": key[1:],
+			"processes": processes,
+			"go_ids": go_ids,
+			"words": words,
+			"postings": [postings[word] for word in words]
+		}
+		data_cache_put(key, go_index)
+
+	return go_index
+
+#go search function: ids of the processes matching any keyword, GO ids are matched exactly and other keywords as prefix of a word in the process name
+def search_go(search_value, contrast):
+	go_index = get_go_index(contrast)
+	search_query = split_go_words(search_value)
+	#no keywords means no filtering
+	if len(search_query) == 0:
+		return list(range(len(go_index["processes"])))
+
+	key = ("go_search",) + go_index["source"] + (tuple(sorted(set(search_query))),)
+	process_ids = data_cache_get(key)
+	if process_ids is None:
+		process_ids = set()
 		for x in search_query:
 			#if it is a GO id, search for GO id
 			if x.startswith("go:"):
-				go_id = process_lower.split("~")[0]
-				if x == go_id:
-					if process not in processes_to_keep:
-						processes_to_keep.append(process)
-			#else, just search in the name og the GO category
+				process_ids |= go_index["go_ids"].get(x, set())
+			#else, search words starting with the keyword
 			else:
-				if x in process_lower.split("~")[1]:
-					processes_to_keep.append(process)
-					if process not in processes_to_keep:
-						processes_to_keep.append(process)
+				i = bisect.bisect_left(go_index["words"], x)
+				while i < len(go_index["words"]) and go_index["words"][i].startswith(x):
+					process_ids |= go_index["postings"][i]
+					i += 1
+		process_ids = sorted(process_ids)
+		data_cache_put(key, process_ids)
 
-	return processes_to_keep
+	return process_ids
 
-#dge table rendering
-def dge_table_operations(table, dataset, fdr):
+#function to get the GO process names from their ids in the search index
+def get_go_processes(contrast, process_ids):
+	go_index = get_go_index(contrast)
+
+	return [go_index["processes"][process_id] for process_id in process_ids]
+
+#dge table rendering: links, column names and sorting by FDR
+def prepare_dge_table(table, dataset):
 	#define dataset specific variables and link
 	if dataset == "human":
 		base_mean_label = "Average expression"
@@ -1085,12 +1927,18 @@ def dge_table_operations(table, dataset, fdr):
 	table["id"] = table[gene_column_name]
 	table = table.rename(columns={"log2FoldChange": "log2 FC", "lfcSE": "log2 FC SE", "pvalue": "P-value", "padj": "FDR", "baseMean": base_mean_label})
 	table = table.sort_values(by=["FDR"])
-	table["FDR"] = table["FDR"].fillna("NA")
 
-	#define data
-	data = table.to_dict("records")
+	return table
+
+#dge table columns
+def get_dge_table_columns(dataset):
+	if dataset == "human":
+		base_mean_label = "Average expression"
+		gene_column_name = "Gene"
+	else:
+		base_mean_label = "Average abundance"
+		gene_column_name = dataset.split("_")[1].capitalize()
 
-	#define columns
 	columns = [
 		{"name": gene_column_name, "id": gene_column_name}, 
 		{"name": "Gene ID", "id":"Gene ID"},
@@ -1105,7 +1953,10 @@ def dge_table_operations(table, dataset, fdr):
 	if dataset != "human":
 		del columns[1]
 
-	#color rows by pvalue and up and down log2FC
+	return columns
+
+#color rows by pvalue and up and down log2FC
+def get_dge_table_style(fdr):
 	style_data_conditional = [
 		{
 			"if": {
@@ -1127,7 +1978,148 @@ def dge_table_operations(table, dataset, fdr):
 		}
 	]
 
-	return columns, data, style_data_conditional
+	return style_data_conditional
+
+#dge table rendering for the tables paged in the browser
+def dge_table_operations(table, dataset, fdr):
+	table = prepare_dge_table(table, dataset)
+	table["FDR"] = table["FDR"].fillna("NA")
+
+	#define data
+	data = table.to_dict("records")
+
+	return get_dge_table_columns(dataset), data, get_dge_table_style(fdr)
+
+#function to get the rendered dge table of a contrast and its cache key, built once per data version
+def get_dge_table(dataset, contrast):
+	file_url = "data/" + dataset + "/dge/" + contrast + ".diffexp.tsv"
+	key = ("dge_table", file_url, get_table_source(file_url)[1])
+	table = data_cache_get(key)
+	if table is None:
+		table = prepare_dge_table(read_tsv(file_url), dataset)
+		table = table.reset_index(drop=True)
+		data_cache_put(key, table)
+
+	return table, key
+
+#operators of the filter queries of the tables with custom filtering
+filter_operators = [["ge ", ">="], ["le ", "<="], ["lt ", "<"], ["gt ", ">"], ["ne ", "!="], ["eq ", "="], ["contains "], ["datestartswith "]]
+
+#function to split a part of a filter query in column, operator and value
+def split_filter_part(filter_part):
+	for operator_type in filter_operators:
+		for operator in operator_type:
+			if operator in filter_part:
+				name_part, value_part = filter_part.split(operator, 1)
+				name = name_part[name_part.find("{") + 1: name_part.rfind("}")]
+				value_part = value_part.strip()
+				#quoted values are strings, the others are numbers if possible
+				if len(value_part) > 1 and value_part[0] == value_part[-1] and value_part[0] in ["'", '"', "`"]:
+					value = value_part[1: -1].replace("\\" + value_part[0], value_part[0])
+				else:
+					try:
+						value = float(value_part)
+					except ValueError:
+						value = value_part
+				#word operators need spaces after them in the filter query, the name is enough
+				return name, operator_type[0].strip(), value
+
+	return None, None, None
+
+#function to get the positions of the rows of a table matching a filter query, in the requested order
+def get_table_view(table, sort_by, filter_query):
+	mask = np.ones(len(table), dtype=bool)
+	if filter_query is not None and filter_query != "":
+		for filter_part in filter_query.split(" && "):
+			column, operator, value = split_filter_part(filter_part)
+			if column not in table.columns:
+				continue
+			if operator in ["eq", "ne", "lt", "le", "gt", "ge"]:
+				try:
+					mask &= getattr(table[column], operator)(value).to_numpy()
+				#a number compared to a string never matches
+				except TypeError:
+					mask[:] = False
+			elif operator == "contains":
+				mask &= table[column].astype(str).str.contains(str(value), case=False, regex=False).to_numpy()
+			elif operator == "datestartswith":
+				mask &= table[column].astype(str).str.startswith(str(value)).to_numpy()
+	positions = np.flatnonzero(mask)
+
+	#sort, missing values are always last
+	sort_by = [sort for sort in sort_by or [] if sort["column_id"] in table.columns]
+	if len(sort_by) > 0:
+		view = table.iloc[positions].reset_index(drop=True)
+		view = view.sort_values(by=[sort["column_id"] for sort in sort_by], ascending=[sort["direction"] == "asc" for sort in sort_by], kind="mergesort", na_position="last")
+		positions = positions[view.index.to_numpy()]
+
+	return positions
+
+#function to get a page of a table with server-side paging, sorting and filtering, and the number of pages
+def get_table_page(table, table_key, page_current, page_size, sort_by, filter_query):
+	#the view is cached so that moving between pages does not filter and sort again
+	key = ("table_view", table_key, repr(sort_by), filter_query)
+	view = data_cache_get(key)
+	if view is None:
+		view = get_table_view(table, sort_by, filter_query)
+		data_cache_put(key, view)
+	page_count = max(int(np.ceil(len(view) / page_size)), 1)
+	page = table.iloc[view[page_current * page_size: (page_current + 1) * page_size]]
+
+	return page, page_count
+
+#function to get the DEG index of a contrast, built once per data version:
+#the table for the MA plot, its positions sorted by padj and the cumulative counts of up and down genes along them
+def get_deg_index(dataset, contrast):
+	file_url = "data/" + dataset + "/dge/" + contrast + ".diffexp.tsv"
+	key = ("deg_index", file_url, get_table_source(file_url)[1])
+	deg_index = data_cache_get(key)
+	if deg_index is None:
+		table = read_tsv(file_url, copy=False)
+		table = table[["Gene", "padj", "baseMean", "log2FoldChange"]].copy()
+		table["Gene"] = table["Gene"].fillna("NA")
+		#log2 base mean
+		table["log2_baseMean"] = np.log2(table["baseMean"])
+		#clean gene/species name
+		table["Gene"] = [i.replace("_", " ").replace("[", "").replace("]", "") for i in table["Gene"]]
+		table = table[["Gene", "padj", "log2_baseMean", "log2FoldChange"]].reset_index(drop=True)
+
+		#nan padj are sorted last and are never DEGs
+		order = np.argsort(table["padj"].to_numpy(), kind="mergesort")
+		log2fc = table["log2FoldChange"].to_numpy()[order]
+		deg_index = {
+			"table": table,
+			"order": order,
+			"padj": table["padj"].to_numpy()[order],
+			"up": np.cumsum(log2fc > 0),
+			"down": np.cumsum(log2fc < 0)
+		}
+		data_cache_put(key, deg_index)
+
+	return deg_index
+
+#function to get the MA plot table of a contrast with the DEG column for a stringency, and the number of up and down DEGs
+def get_degs(dataset, contrast, fdr):
+	deg_index = get_deg_index(dataset, contrast)
+	#number of genes with padj <= fdr
+	n = np.searchsorted(deg_index["padj"], fdr, side="right")
+	if n > 0:
+		up = int(deg_index["up"][n - 1])
+		down = int(deg_index["down"][n - 1])
+	else:
+		up = 0
+		down = 0
+
+	#find DEGs
+	table = deg_index["table"].copy()
+	degs = deg_index["order"][:n]
+	log2fc = table["log2FoldChange"].to_numpy()[degs]
+	deg = np.full(len(table), "no_DEG", dtype=object)
+	deg[degs[log2fc > 0]] = "Up"
+	deg[degs[log2fc < 0]] = "Down"
+	table["DEG"] = deg
+
+	return table, up, down
 
 #palette to use to get color
 def get_color(metadata, i):
@@ -1142,24 +2134,28 @@ def get_color(metadata, i):
 
 ### DOWNLOAD CALLBACKS ###
 
-#download diffexp
-@app.callback(
-	Output("download_diffexp", "href"),
-	Output("download_diffexp", "download"),
-	Input("download_diffexp_button", "n_clicks"),
-	Input("expression_dataset_dropdown", "value"),
-	Input("contrast_dropdown", "value")
-)
-def downlaod_diffexp_table(button_click, dataset, contrast):
+#exports are streamed by these routes when a download link is clicked, the callbacks only update the links
+#rows per chunk of the streamed tsv and xlsx files
+export_chunk_rows = 10000
 
-	#download from GitHub
-	df = download_from_github("data/" + dataset + "/dge/" + contrast + ".diffexp.tsv")
-	#read the downloaded content and make a pandas dataframe
-	df = pd.read_csv(df, sep="\t")
+#dataset, contrast and other names in export urls are plain names, never paths
+def check_export_name(name):
+	if re.fullmatch(r"[A-Za-z0-9_\-]+", name) is None:
+		flask.abort(404)
+
+#function to get the dge table of a contrast as exported, optionally only some genes
+def get_dge_export_table(dataset, contrast, genes=None):
+	df = read_tsv("data/" + dataset + "/dge/" + contrast + ".diffexp.tsv", copy=False)
 	df = df[["Gene", "Geneid", "log2FoldChange", "lfcSE", "pvalue", "padj", "baseMean"]]
 
 	if dataset != "human":
-		df["Gene"] = [x.replace("_", " ").replace("[", "").replace("]", "") for x in df["Gene"]]
+		df = df.assign(Gene=[x.replace("_", " ").replace("[", "").replace("]", "") for x in df["Gene"]])
+
+	#filter selected genes
+	if genes is not None:
+		if dataset != "human":
+			genes = [gene.replace("_", " ").replace("[", "").replace("]", "") for gene in genes]
+		df = df[df["Gene"].isin(genes)]
 
 	#define dataset specific variables
 	if dataset == "human":
@@ -1177,10 +2173,333 @@ def downlaod_diffexp_table(button_click, dataset, contrast):
 	if dataset != "human":
 		df = df[[gene_column_name, "log2 FC", "log2 FC SE", "P-value", "FDR", base_mean_label]]
 
-	#create a downloadable tsv file forced to excel by extension
-	link = df.to_csv(index=False, encoding="utf-8", sep="\t")
-	link = "data:text/tsv;charset=utf-8," + urllib.parse.quote(link)
-	file_name = "DGE_{}_{}.xls".format(dataset, contrast)
+	return df
+
+#function to get the go table of a contrast as exported, optionally only the processes matching a search
+def get_go_export_table(contrast, search_value=None):
+	df = read_tsv("data/human/padj_1e-10/" + contrast + ".merged_go.tsv", copy=False)
+	df = df[["DGE", "Genes", "Process~name", "num_of_Genes", "gene_group", "percentage%", "P-value"]]
+
+	if search_value is not None:
+		df = df[df["Process~name"].isin(get_go_processes(contrast, search_go(search_value, contrast)))]
+
+	df = df.rename(columns={"Process~name": "GO biological process", "num_of_Genes": "DEGs", "gene_group": "Dataset genes", "percentage%": "Enrichment"})
+
+	return df
+
+#function to stream a df as a tsv file, in chunks of rows and gzip-compressed if the browser accepts it
+def stream_tsv(df, file_name):
+	gzip_enabled = "gzip" in flask.request.accept_encodings
+
+	def generate_tsv():
+		compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if gzip_enabled else None
+		#an empty table has its header only
+		for start in range(0, max(len(df), 1), export_chunk_rows):
+			chunk = df.iloc[start:start + export_chunk_rows].to_csv(index=False, header=start == 0, sep="\t").encode("utf-8")
+			if compressor is not None:
+				chunk = compressor.compress(chunk)
+			if len(chunk) > 0:
+				yield chunk
+		if compressor is not None:
+			yield compressor.flush()
+
+	response = flask.Response(generate_tsv(), mimetype="text/tab-separated-values")
+	response.headers["Content-Disposition"] = "attachment; filename=\"{}\"".format(file_name)
+	response.headers["Vary"] = "Accept-Encoding"
+	if gzip_enabled:
+		response.headers["Content-Encoding"] = "gzip"
+
+	return response
+
+#excel sheet titles are at most 31 characters long, without []:*?/\ and unique in a workbook
+def get_sheet_titles(names):
+	titles = []
+	for name in names:
+		title = re.sub(r"[\[\]:*?/\\]", "_", name)[:31]
+		i = 1
+		while title in titles:
+			suffix = "_{}".format(i)
+			title = re.sub(r"[\[\]:*?/\\]", "_", name)[:31 - len(suffix)] + suffix
+			i += 1
+		titles.append(title)
+
+	return titles
+
+#function to write sheets, pairs of title and df, in a xlsx file
+#the workbook is write-only: rows are streamed to disk, so memory does not grow with the number of rows and sheets
+def write_xlsx(sheets, xlsx_file):
+	workbook = openpyxl.Workbook(write_only=True)
+	for title, df in sheets:
+		worksheet = workbook.create_sheet(title)
+		worksheet.append([str(column) for column in df.columns])
+		for start in range(0, len(df), export_chunk_rows):
+			#missing values are empty cells
+			chunk = df.iloc[start:start + export_chunk_rows].astype(object)
+			chunk = chunk.where(chunk.notna(), None)
+			for row in chunk.itertuples(index=False, name=None):
+				worksheet.append(row)
+	workbook.save(xlsx_file)
+
+#function to stream a file in chunks, closing it at the end
+def stream_file(export_file, file_name, mimetype):
+	export_file.seek(0, os.SEEK_END)
+	size = export_file.tell()
+	export_file.seek(0)
+
+	def generate_file():
+		with export_file:
+			chunk = export_file.read(1024 * 1024)
+			while len(chunk) > 0:
+				yield chunk
+				chunk = export_file.read(1024 * 1024)
+
+	response = flask.Response(generate_file(), mimetype=mimetype)
+	response.headers["Content-Disposition"] = "attachment; filename=\"{}\"".format(file_name)
+	response.headers["Content-Length"] = size
+
+	return response
+
+xlsx_mimetype = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+#function to stream a df in the format asked by the request: xlsx with format=xlsx, otherwise tsv
+def export_table(df, title, file_name):
+	if flask.request.args.get("format") == "xlsx":
+		xlsx_file = tempfile.TemporaryFile()
+		write_xlsx([(get_sheet_titles([title])[0], df)], xlsx_file)
+		return stream_file(xlsx_file, file_name + ".xlsx", xlsx_mimetype)
+
+	return stream_tsv(df, file_name + ".tsv")
+
+@server.route("/download/dge/<dataset>/<contrast>")
+def download_dge(dataset, contrast):
+	check_export_name(dataset)
+	check_export_name(contrast)
+	genes = flask.request.args.getlist("gene")
+	try:
+		df = get_dge_export_table(dataset, contrast, genes if len(genes) > 0 else None)
+	except FileNotFoundError:
+		flask.abort(404)
+	file_name = "DGE_{}_{}{}".format(dataset, contrast, "_filtered" if len(genes) > 0 else "")
+
+	return export_table(df, contrast, file_name)
+
+@server.route("/download/go/<contrast>")
+def download_go(contrast):
+	check_export_name(contrast)
+	search_value = flask.request.args.get("search")
+	try:
+		df = get_go_export_table(contrast, search_value)
+	except FileNotFoundError:
+		flask.abort(404)
+	file_name = "GO_human_{}{}".format(contrast, "_shown" if search_value is not None else "")
+
+	return export_table(df, contrast, file_name)
+
+#function to get the metadata export in a format, built once per metadata version and kept in the LRU; tsv is kept gzip-compressed
+def get_metadata_export(version, file_format):
+	key = ("metadata_export", version, file_format)
+	body = data_cache_get(key)
+	if body is None:
+		def build_metadata_export():
+			metadata_df = get_metadata()
+			df = metadata_df[get_metadata_table_columns(metadata_df)].rename(columns=label_to_value)
+			if file_format == "xlsx":
+				export_file = io.BytesIO()
+				write_xlsx([("Metadata", df)], export_file)
+				body = export_file.getvalue()
+			else:
+				compressor = zlib.compressobj(9, zlib.DEFLATED, 31)
+				body = compressor.compress(df.to_csv(index=False, sep="\t").encode("utf-8")) + compressor.flush()
+			data_cache_put(key, body)
+			return body
+		body = single_flight(key, build_metadata_export)
+
+	return body
+
+#links to the metadata export carry its version (v), so that browsers and proxies keep it until the metadata changes;
+#without it the export is revalidated with its etag
+@server.route("/download/metadata")
+def download_metadata():
+	file_format = "xlsx" if flask.request.args.get("format") == "xlsx" else "tsv"
+	version = get_metadata_version()
+	body = get_metadata_export(version, file_format)
+	etag = "{}-{}".format(version, file_format)
+
+	if file_format == "xlsx":
+		response = flask.Response(body, mimetype=xlsx_mimetype)
+	else:
+		if "gzip" in flask.request.accept_encodings:
+			response = flask.Response(body, mimetype="text/tab-separated-values")
+			response.headers["Content-Encoding"] = "gzip"
+			etag += "-gzip"
+		else:
+			response = flask.Response(zlib.decompress(body, 31), mimetype="text/tab-separated-values")
+		response.headers["Vary"] = "Accept-Encoding"
+	response.headers["Content-Disposition"] = "attachment; filename=\"TaMMa_metadata.{}\"".format(file_format)
+	response.set_etag(etag)
+	if flask.request.args.get("v") == version:
+		response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+	else:
+		response.headers["Cache-Control"] = "no-cache"
+
+	return response.make_conditional(flask.request)
+
+#function to get the counts of genes or species as exported: the metadata of the samples with counts and a column of counts per gene
+def get_multiboxplots_export_table(dataset, genes):
+	metadata_df = get_metadata()
+	counts = read_counts_many(dataset, genes)
+	counts = counts.pivot(index="sample", columns="gene", values="counts")
+	counts = counts.reindex(index=metadata_df["sample"], columns=genes).reset_index(drop=True)
+	counts.columns = [gene.replace("[", "").replace("]", "").replace("_", " ") for gene in genes]
+	df = metadata_df[get_metadata_table_columns(metadata_df)].rename(columns=label_to_value).reset_index(drop=True)
+	df = pd.concat([df, counts], axis=1)
+	df = df[counts.notna().any(axis=1)]
+
+	return df
+
+@server.route("/download/multiboxplots/<dataset>")
+def download_multiboxplots(dataset):
+	check_export_name(dataset)
+	genes = flask.request.args.getlist("gene")
+	#only genes and species of the dataset
+	try:
+		if dataset == "human":
+			all_genes = read_tsv("manual/genes_list.tsv", header=None, names=["genes"], copy=False)
+		else:
+			all_genes = read_tsv("manual/{}_list.tsv".format(dataset), header=None, names=["genes"], copy=False)
+	except FileNotFoundError:
+		flask.abort(404)
+	if len(genes) == 0 or not pd.Index(genes).isin(all_genes["genes"]).all():
+		flask.abort(404)
+	df = get_multiboxplots_export_table(dataset, genes)
+
+	return export_table(df, "Counts", "TaMMa_{}_counts".format(dataset))
+
+#exports of all the contrasts of a dataset are written in background in the cache dir, once per data version
+#a job is claimed across workers by creating its lock file: the worker that creates it runs the job, the others report it running
+#until its file is written, or failed if it left a failed marker
+export_executor = ThreadPoolExecutor(max_workers=1)
+export_jobs = {}
+export_jobs_lock = threading.Lock()
+#seconds after which the lock of a job is stale, e.g. its worker was killed; running jobs touch it at every sheet
+export_lock_timeout = 300
+
+def get_export_path(export_id, extension=".xlsx"):
+	return os.path.join(cache_dir, "exports", export_id + extension)
+
+#function to write an export atomically, so that no worker serves a partial file, and release its lock
+def write_export(export_id, get_sheets):
+	path = get_export_path(export_id)
+	lock_path = get_export_path(export_id, ".lock")
+
+	def get_claimed_sheets():
+		for sheet in get_sheets():
+			os.utime(lock_path)
+			yield sheet
+
+	try:
+		fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+		try:
+			with os.fdopen(fd, "wb") as tmp_file:
+				write_xlsx(get_claimed_sheets(), tmp_file)
+		except BaseException as error:
+			os.remove(tmp_path)
+			print("export {} failed: {}".format(export_id, error), file=sys.stderr)
+			with open(get_export_path(export_id, ".failed"), "w"):
+				pass
+			raise
+		os.replace(tmp_path, path)
+	finally:
+		os.remove(lock_path)
+
+#function to claim the job of an export for this worker, False if another worker holds it
+def claim_export(export_id):
+	lock_path = get_export_path(export_id, ".lock")
+	os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+	try:
+		fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+	except FileExistsError:
+		#the lock of a dead job is taken over
+		try:
+			if time.time() - os.path.getmtime(lock_path) < export_lock_timeout:
+				return False
+			os.remove(lock_path)
+		except FileNotFoundError:
+			pass
+		return claim_export(export_id)
+	os.close(fd)
+
+	return True
+
+#function to get the status of an export, "done", "running" or "failed", starting its job if needed
+def get_export_status(export_id, get_sheets, retry=False):
+	if os.path.isfile(get_export_path(export_id)):
+		return "done"
+	with export_jobs_lock:
+		future = export_jobs.get(export_id)
+		if future is not None and not future.done():
+			return "running"
+		#failed jobs, of any worker, are restarted on request only
+		failed_path = get_export_path(export_id, ".failed")
+		if os.path.isfile(failed_path):
+			if not retry:
+				return "failed"
+			try:
+				os.remove(failed_path)
+			except FileNotFoundError:
+				pass
+		if not claim_export(export_id):
+			return "running"
+		#the file can have been written by another worker since the check above
+		if os.path.isfile(get_export_path(export_id)):
+			os.remove(get_export_path(export_id, ".lock"))
+			return "done"
+		export_jobs[export_id] = export_executor.submit(write_export, export_id, get_sheets)
+
+	return "running"
+
+#function to get the id of the export of all the contrasts of a dataset and the function generating its sheets
+#the id changes with the versions of the dge tables
+def get_all_contrasts_export(dataset):
+	if dataset == "human":
+		contrasts = read_tsv("manual/contrast_list_human.tsv", copy=False)["comparison"].unique().tolist()
+	else:
+		contrasts = read_tsv("manual/contrast_list_meta.tsv", copy=False)["comparison"].unique().tolist()
+	versions = [[contrast, get_table_source("data/" + dataset + "/dge/" + contrast + ".diffexp.tsv")[1]] for contrast in contrasts]
+	contrasts = [contrast for contrast, version in versions if version is not None]
+	export_id = hashlib.sha256(json.dumps(["dge_all_contrasts", dataset, versions]).encode("utf-8")).hexdigest()
+
+	#a first sheet lists the contrasts, whose names can be too long for sheet titles
+	def get_sheets():
+		titles = get_sheet_titles(["Contrasts"] + contrasts)
+		yield titles[0], pd.DataFrame({"Sheet": titles[1:], "Contrast": contrasts})
+		for title, contrast in zip(titles[1:], contrasts):
+			yield title, get_dge_export_table(dataset, contrast)
+
+	return export_id, get_sheets
+
+@server.route("/download/dge_all/<dataset>/<export_id>")
+def download_all_contrasts(dataset, export_id):
+	check_export_name(dataset)
+	if re.fullmatch(r"[0-9a-f]{64}", export_id) is None:
+		flask.abort(404)
+	try:
+		xlsx_file = open(get_export_path(export_id), "rb")
+	except FileNotFoundError:
+		flask.abort(404)
+
+	return stream_file(xlsx_file, "DGE_{}_all_contrasts.xlsx".format(dataset), xlsx_mimetype)
+
+#download diffexp
+@app.callback(
+	Output("download_diffexp", "href"),
+	Output("download_diffexp", "download"),
+	Input("expression_dataset_dropdown", "value"),
+	Input("contrast_dropdown", "value")
+)
+def downlaod_diffexp_table(dataset, contrast):
+	link = app.get_relative_path("/download/dge/{}/{}".format(dataset, contrast)) + "?format=xlsx"
+	file_name = "DGE_{}_{}.xlsx".format(dataset, contrast)
 
 	return link, file_name
 
@@ -1189,12 +2508,11 @@ def downlaod_diffexp_table(button_click, dataset, contrast):
 	Output("download_diffexp_partial", "href"),
 	Output("download_diffexp_partial", "download"),
 	Output("download_diffexp_button_partial", "disabled"),
-	Input("download_diffexp_button_partial", "n_clicks"),
 	Input("expression_dataset_dropdown", "value"),
 	Input("contrast_dropdown", "value"),
 	Input("multi_gene_dge_table_selection_dropdown", "value"),
 )
-def downlaod_diffexp_table_partial(button_click, dataset, contrast, dropdown_values):
+def downlaod_diffexp_table_partial(dataset, contrast, dropdown_values):
 	ctx = dash.callback_context
 	trigger_id = ctx.triggered[0]["prop_id"]
 	
@@ -1202,64 +2520,55 @@ def downlaod_diffexp_table_partial(button_click, dataset, contrast, dropdown_val
 		link = ""
 		file_name = ""
 		disabled_status = True
-	
 	else:
 		disabled_status = False
-		#download from GitHub
-		url = "data/" + dataset + "/dge/" + contrast + ".diffexp.tsv"
-		#read the downloaded content and make a pandas dataframe
-		df = download_from_github(url)
-		df = pd.read_csv(df, sep="\t")
+		link = app.get_relative_path("/download/dge/{}/{}".format(dataset, contrast)) + "?" + urllib.parse.urlencode({"gene": dropdown_values, "format": "xlsx"}, doseq=True)
+		file_name = "DGE_{}_{}_filtered.xlsx".format(dataset, contrast)
 
-		#filter selected genes
-		if dataset != "human":
-			df["Gene"] = [x.replace("_", " ").replace("[", "").replace("]", "") for x in df["Gene"]]
-			dropdown_values = [value.replace("_", " ").replace("[", "").replace("]", "") for value in dropdown_values]
-		df = df[df["Gene"].isin(dropdown_values)]
+	return link, file_name, disabled_status
 
-		#define dataset specific variables
-		if dataset == "human":
-			base_mean_label = "Average expression"
-		else:
-			base_mean_label = "Average abundance"
-			gene_column_name = dataset.split("_")[1].capitalize()
-			df = df.rename(columns={"Gene": gene_column_name})
+#download all contrasts: the button starts the export, then its status is polled until the file is ready
+@app.callback(
+	Output("download_diffexp_all", "href"),
+	Output("download_diffexp_all", "download"),
+	Output("download_diffexp_all", "hidden"),
+	Output("download_diffexp_all_button", "children"),
+	Output("download_diffexp_all_button", "disabled"),
+	Output("download_diffexp_all_interval", "disabled"),
+	Input("download_diffexp_all_button", "n_clicks"),
+	Input("download_diffexp_all_interval", "n_intervals"),
+	Input("expression_dataset_dropdown", "value"),
+	prevent_initial_call=True
+)
+def download_all_contrasts_table(n_clicks, n_intervals, dataset):
+	ctx = dash.callback_context
+	trigger_id = ctx.triggered[0]["prop_id"]
 
-		#data carpentry and links
-		df = df.rename(columns={"Geneid": "Gene ID", "log2FoldChange": "log2 FC", "lfcSE": "log2 FC SE", "pvalue": "P-value", "padj": "FDR", "baseMean": base_mean_label})
-		df = df.sort_values(by=["FDR"])
+	#the export of the previous dataset is hidden
+	if trigger_id == "expression_dataset_dropdown.value":
+		return "", "", True, "Export all contrasts", False, True
 
-		#remove a geneid in non human dge
-		if dataset != "human":
-			df = df[[gene_column_name, "log2 FC", "log2 FC SE", "P-value", "FDR", base_mean_label]]
+	export_id, get_sheets = get_all_contrasts_export(dataset)
+	status = get_export_status(export_id, get_sheets, retry=trigger_id == "download_diffexp_all_button.n_clicks")
+	if status == "running":
+		return "", "", True, "Preparing export...", True, False
+	elif status == "failed":
+		return "", "", True, "Export failed, retry", False, True
 
-		#create a downloadable tsv file forced to excel by extension
-		link = df.to_csv(index=False, encoding="utf-8", sep="\t")
-		link = "data:text/tsv;charset=utf-8," + urllib.parse.quote(link)
-		file_name = "DGE_{}_{}_filtered.xls".format(dataset, contrast)
+	link = app.get_relative_path("/download/dge_all/{}/{}".format(dataset, export_id))
+	file_name = "DGE_{}_all_contrasts.xlsx".format(dataset)
 
-	return link, file_name, disabled_status
+	return link, file_name, False, "Export all contrasts", False, True
 
 #download go
 @app.callback(
 	Output("download_go", "href"),
 	Output("download_go", "download"),
-	Input("download_go", "n_clicks"),
 	Input("contrast_dropdown", "value")
 )
-def download_go_table(button_click, contrast):
-
-	#download from GitHub
-	url = "data/human/padj_1e-10/" + contrast + ".merged_go.tsv"
-	df = download_from_github(url)
-	df = pd.read_csv(df, sep="\t")
-
-	df = df[["DGE", "Genes", "Process~name", "num_of_Genes", "gene_group", "percentage%", "P-value"]]
-	df = df.rename(columns={"Process~name": "GO biological process", "num_of_Genes": "DEGs", "gene_group": "Dataset genes", "percentage%": "Enrichment"})
-
-	link = df.to_csv(index=False, encoding="utf-8", sep="\t")
-	link = "data:text/tsv;charset=utf-8," + urllib.parse.quote(link)
-	file_name = "GO_human_{}.xls".format(contrast)
+def download_go_table(contrast):
+	link = app.get_relative_path("/download/go/{}".format(contrast)) + "?format=xlsx"
+	file_name = "GO_human_{}.xlsx".format(contrast)
 
 	return link, file_name
 
@@ -1268,28 +2577,18 @@ def download_go_table(button_click, contrast):
 	Output("download_go_partial", "href"),
 	Output("download_go_partial", "download"),
 	Output("download_go_button_partial", "disabled"),
-	Input("download_go_partial", "n_clicks"),
-	Input("contrast_dropdown", "value"),
-	Input("go_plot_filter_input", "value")
+	Input("go_filter", "data")
 )
-def download_partial_go_table(n_clicks, contrast, search_value):
+def download_partial_go_table(go_filter):
+	if go_filter is None:
+		raise PreventUpdate
+	contrast = go_filter["contrast"]
+
 	#define search query if present
-	if search_value is not None and search_value != "":
+	if go_filter["process_ids"] is not None:
 		disabled_status = False
-		go_df = download_from_github("data/human/padj_1e-10/" + contrast + ".merged_go.tsv")
-		go_df = pd.read_csv(go_df, sep="\t")
-		go_df = go_df[["DGE", "Genes", "Process~name", "num_of_Genes", "gene_group", "percentage%", "P-value"]]
-		
-		processes_to_keep = serach_go(search_value, go_df)
-
-		#filtering
-		go_df = go_df[go_df["Process~name"].isin(processes_to_keep)]
-
-		go_df = go_df.rename(columns={"Process~name": "GO biological process", "num_of_Genes": "DEGs", "gene_group": "Dataset genes", "percentage%": "Enrichment"})
-
-		link = go_df.to_csv(index=False, encoding="utf-8", sep="\t")
-		link = "data:text/tsv;charset=utf-8," + urllib.parse.quote(link)
-		file_name = "GO_human_{}_shown.xls".format(contrast)
+		link = app.get_relative_path("/download/go/{}".format(contrast)) + "?" + urllib.parse.urlencode({"search": go_filter["search_value"], "format": "xlsx"})
+		file_name = "GO_human_{}_shown.xlsx".format(contrast)
 	else:
 		link = ""
 		file_name = ""
@@ -1297,6 +2596,25 @@ def download_partial_go_table(n_clicks, contrast, search_value):
 
 	return link, file_name, disabled_status
 
+#download the counts of the multiboxplots, once plotted
+@app.callback(
+	Output("download_multiboxplots", "href"),
+	Output("download_multiboxplots", "download"),
+	Output("download_multiboxplots_button", "disabled"),
+	Input("update_multixoplot_plot_button", "n_clicks"),
+	State("gene_species_multi_boxplots_dropdown", "value"),
+	State("expression_dataset_dropdown", "value"),
+	prevent_initial_call=True
+)
+def download_multiboxplots_table(n_clicks, selected_genes_species, expression_dataset):
+	#same limits of the plot
+	if selected_genes_species is None or len(selected_genes_species) == 0 or len(selected_genes_species) > 10:
+		return "", "", True
+	link = app.get_relative_path("/download/multiboxplots/{}".format(expression_dataset)) + "?" + urllib.parse.urlencode({"gene": selected_genes_species, "format": "xlsx"}, doseq=True)
+	file_name = "TaMMa_{}_counts.xlsx".format(expression_dataset)
+
+	return link, file_name, False
+
 ### TABLES ###
 
 #dge table filtered by multidropdown
@@ -1322,8 +2640,7 @@ def get_filtered_dge_table(dropdown_values, contrast, dataset, fdr):
 	else:
 		hidden_div = False
 		#open tsv
-		table = download_from_github("data/" + dataset + "/dge/" + contrast + ".diffexp.tsv")
-		table = pd.read_csv(table, sep = "\t")
+		table = read_tsv("data/" + dataset + "/dge/" + contrast + ".diffexp.tsv")
 
 		#filter selected genes
 		if dataset != "human":
@@ -1335,39 +2652,94 @@ def get_filtered_dge_table(dropdown_values, contrast, dataset, fdr):
 
 	return columns, data, style_data_conditional, hidden_div
 
-#dge table full
+#dge table full, paged, sorted and filtered on the server
 @app.callback(
 	Output("dge_table", "columns"),
 	Output("dge_table", "data"),
 	Output("dge_table", "style_data_conditional"),
+	Output("dge_table", "page_count"),
+	Output("dge_table", "page_current"),
 	Input("contrast_dropdown", "value"),
 	Input("expression_dataset_dropdown", "value"),
-	Input("stringency_dropdown", "value")
+	Input("stringency_dropdown", "value"),
+	Input("dge_table", "page_current"),
+	Input("dge_table", "sort_by"),
+	Input("dge_table", "filter_query"),
+	State("dge_table", "page_size")
 )
-def display_dge_table(contrast, dataset, fdr):
-	#open tsv
-	table = download_from_github("data/" + dataset + "/dge/" + contrast + ".diffexp.tsv")
-	table = pd.read_csv(table, sep = "\t")
-	
-	columns, data, style_data_conditional = dge_table_operations(table, dataset, fdr)
+def display_dge_table(contrast, dataset, fdr, page_current, sort_by, filter_query, page_size):
+	ctx = dash.callback_context
+	trigger_id = ctx.triggered[0]["prop_id"]
+
+	#a new table or a new query starts from the first page
+	if trigger_id != "dge_table.page_current" or page_current is None:
+		page_current = 0
+
+	table, table_key = get_dge_table(dataset, contrast)
+	page, page_count = get_table_page(table, table_key, page_current, page_size, sort_by, filter_query)
+	page = page.copy()
+	page["FDR"] = page["FDR"].fillna("NA")
+	data = page.to_dict("records")
+
+	return get_dge_table_columns(dataset), data, get_dge_table_style(fdr), page_count, page_current
+
+#metadata table, paged by the server, and the versioned link to its export
+@app.callback(
+	Output("metadata_table", "data"),
+	Output("metadata_table", "page_count"),
+	Output("metadata_table", "page_current"),
+	Output("download_metadata", "href"),
+	Input("metadata_table", "page_current"),
+	Input("metadata_table", "sort_by"),
+	Input("metadata_table", "filter_query"),
+	State("metadata_table", "page_size")
+)
+def display_metadata_table(page_current, sort_by, filter_query, page_size):
+	ctx = dash.callback_context
+	trigger_id = ctx.triggered[0]["prop_id"]
+
+	#a new query starts from the first page
+	if trigger_id != "metadata_table.page_current" or page_current is None:
+		page_current = 0
+
+	table, table_key = get_metadata_table()
+	page, page_count = get_table_page(table, table_key, page_current, page_size, sort_by, filter_query)
+	data = page.to_dict("records")
+	link = app.get_relative_path("/download/metadata") + "?" + urllib.parse.urlencode({"format": "xlsx", "v": get_metadata_version()})
 
-	return columns, data, style_data_conditional
+	return data, page_count, page_current, link
+
+#go filtering shared by go table, go plot and partial download: ids of the processes matching the search, None if not filtered
+@app.callback(
+	Output("go_filter", "data"),
+	Input("contrast_dropdown", "value"),
+	Input("go_plot_filter_input", "value")
+)
+def filter_go(contrast, search_value):
+	#define search query if present
+	if search_value is not None and search_value != "":
+		process_ids = search_go(search_value, contrast)
+	else:
+		process_ids = None
+
+	return {"contrast": contrast, "search_value": search_value, "process_ids": process_ids}
 
 #go table
 @app.callback(
 	Output("go_table", "columns"),
 	Output("go_table", "data"),
-	Input("contrast_dropdown", "value"),
-	Input("go_plot_filter_input", "value")
+	Input("go_filter", "data")
 )
-def display_go_table(contrast, search_value):
-	go_df = download_from_github("data/human/padj_1e-10/" + contrast + ".merged_go.tsv")
-	go_df = pd.read_csv(go_df, sep="\t")
+def display_go_table(go_filter):
+	if go_filter is None:
+		raise PreventUpdate
+	contrast = go_filter["contrast"]
+	go_df = read_tsv("data/human/padj_1e-10/" + contrast + ".merged_go.tsv")
 	go_df = go_df[["DGE", "Genes", "Process~name", "num_of_Genes", "gene_group", "percentage%", "P-value"]]
 
 	#define search query if present
-	if search_value is not None and search_value != "":
-		processes_to_keep = serach_go(search_value, go_df)
+	if go_filter["process_ids"] is not None:
+		processes_to_keep = get_go_processes(contrast, go_filter["process_ids"])
 		#filtering
 		go_df = go_df[go_df["Process~name"].isin(processes_to_keep)]
 
@@ -1458,14 +2830,12 @@ def find_genes_or_species(dataset, selected_point_ma_plot, active_cell_full, act
 	#if you change the datast, load it and change options and values
 	elif trigger_id == "expression_dataset_dropdown.value":
 		if dataset == "human":
-			genes = download_from_github("manual/genes_list.tsv")
-			genes = pd.read_csv(genes, sep = "\t", header=None, names=["genes"])
+			genes = read_tsv("manual/genes_list.tsv", header=None, names=["genes"])
 			genes = genes["genes"].dropna().tolist()
 			options = [{"label": i, "value": i} for i in genes]
 			value="TNF"
 		else:
-			species = download_from_github("manual/{}_list.tsv".format(dataset))
-			species = pd.read_csv(species, sep = "\t", header=None, names=["species"])
+			species = read_tsv("manual/{}_list.tsv".format(dataset), header=None, names=["species"])
 			species = species["species"].dropna().tolist()
 			options = [{"label": i.replace("_", " ").replace("[", "").replace("]", ""), "value": i} for i in species]
 			value = species[0]
@@ -1484,16 +2854,14 @@ def get_comparison_filter_options(dataset):
 		tsv = "manual/contrast_list_human.tsv"
 	else:
 		tsv = "manual/contrast_list_meta.tsv"
-	contrasts = download_from_github(tsv)
-	contrasts = pd.read_csv(contrasts, sep = "\t")
+	contrasts = read_tsv(tsv)
 	contrasts = contrasts["comparison"].tolist()
 	
 	#get all tissues and groups for dataset
 	if dataset == "human":
-		df = download_from_github("data/human/mds/umap.tsv")
+		df = read_tsv("data/human/mds/umap.tsv")
 	else:
-		df = download_from_github("data/" + dataset.split("_")[0] + "_species/mds/umap.tsv")
-	df = pd.read_csv(df, sep = "\t")
+		df = read_tsv("data/" + dataset.split("_")[0] + "_species/mds/umap.tsv")
 	tissues = df["tissue"].unique().tolist()
 	groups = df["group"].unique().tolist()
 
@@ -1538,10 +2906,9 @@ def get_comparison_filter_options(dataset):
 def filter_contrasts(dataset, filter_element, contrast):
 	#get all contrasts for selected dataset
 	if dataset == "human":
-		df = download_from_github("manual/contrast_list_human.tsv")
+		df = read_tsv("manual/contrast_list_human.tsv")
 	else:
-		df = download_from_github("manual/contrast_list_meta.tsv")
-	df = pd.read_csv(df, sep = "\t")
+		df = read_tsv("manual/contrast_list_meta.tsv")
 
 	#if all, then do not filter
 	if filter_element == "All comparisons":
@@ -1715,10 +3082,9 @@ def serach_genes_in_text_area(n_clicks, expression_dataset, text, already_select
 
 			#get all genes
 			if expression_dataset == "human":
-				all_genes = download_from_github("manual/genes_list.tsv")
+				all_genes = read_tsv("manual/genes_list.tsv", header=None, names=["genes"])
 			else:
-				all_genes = download_from_github("manual/{}_list.tsv".format(expression_dataset))
-			all_genes = pd.read_csv(all_genes, sep = "\t", header=None, names=["genes"])
+				all_genes = read_tsv("manual/{}_list.tsv".format(expression_dataset), header=None, names=["genes"])
 			all_genes = all_genes["genes"].dropna().tolist()
 
 			#upper for case insensitive search
@@ -1817,30 +3183,26 @@ def legend(selected_metadata, contrast_switch, contrast, update_legend, dataset,
 	def rebuild_legend_fig_from_tsv(dataset, selected_metadata):
 		#open tsv
 		if dataset == "human":
-			metadata_umap = download_from_github("data/" + dataset + "/mds/umap.tsv")
+			metadata_umap = read_tsv("data/" + dataset + "/mds/umap.tsv")
 		else:
-			metadata_umap = download_from_github("data/" + dataset + "_species/mds/umap.tsv")
-		metadata_umap = pd.read_csv(metadata_umap, sep = "\t")
+			metadata_umap = read_tsv("data/" + dataset + "_species/mds/umap.tsv")
 		metadata_umap = metadata_umap[["sample"]]
-		metadata = download_from_github("metadata.tsv")
-		metadata = pd.read_csv(metadata, sep = "\t")
+		metadata = get_metadata()
 		metadata = pd.merge(metadata_umap, metadata, how="left", on="sample")
 		
 		#prepare df
-		if str(metadata.dtypes[selected_metadata]) == "object":
+		if is_discrete_metadata(selected_metadata):
 			metadata[selected_metadata] = metadata[selected_metadata].fillna("NA")
 			metadata[selected_metadata] = [i.replace("_", " ") for i in metadata[selected_metadata]]
 		metadata = metadata.sort_values(by=[selected_metadata])
 		#rename columns
 		metadata = metadata.rename(columns=label_to_value)
 		metadata = metadata.replace("_", " ", regex=True)
-		#mock column for plot
-		metadata["mock_column"] = None
 
 		#create figure
 		legend_fig = go.Figure()
 		#discrete variables
-		if str(metadata.dtypes[label_to_value[selected_metadata]]) == "object":
+		if is_discrete_metadata(selected_metadata):
 			i = 0
 			metadata[selected_metadata] = metadata[label_to_value[selected_metadata]].str.replace("_", " ")
 			metadata_fields_ordered = metadata[label_to_value[selected_metadata]].unique().tolist()
@@ -1851,7 +3213,7 @@ def legend(selected_metadata, contrast_switch, contrast, update_legend, dataset,
 				metadata_fields_ordered.insert(0, metadata_fields_ordered.pop(old_index))
 			for metadata_field in metadata_fields_ordered:
 				marker_color = get_color(metadata_field, i)
-				legend_fig.add_trace(go.Scatter(x=metadata["mock_column"], y=metadata["mock_column"], marker_color=marker_color, marker_size=4, mode="markers", legendgroup=metadata_field, showlegend=True, name=metadata_field))
+				legend_fig.add_trace(go.Scatter(x=[None], y=[None], marker_color=marker_color, marker_size=4, mode="markers", legendgroup=metadata_field, showlegend=True, name=metadata_field))
 				i += 1
 			
 			#update layout
@@ -1925,62 +3287,63 @@ def legend(selected_metadata, contrast_switch, contrast, update_legend, dataset,
 
 #plot umap callback
 @app.callback(
-	#umaps
-	Output("umap_metadata", "figure"),
-	Output("umap_expression", "figure"),
+	#umaps, zoom is applied clientside
+	Output("umap_metadata_store", "data"),
+	Output("umap_expression_store", "data"),
 	#config
 	Output("umap_metadata", "config"),
 	Output("umap_expression", "config"),
 	#div
 	Output("umap_metadata_div", "style"),
 	Output("umap_expression_div", "style"),
+	#height and trace visibility
+	Output("umap_view", "data"),
+	#sample metadata of the hovers
+	Output("sample_metadata_store", "data"),
+	Output("sample_metadata_version", "data"),
 	#dropdowns
 	Input("umap_dataset_dropdown", "value"),
 	Input("metadata_dropdown", "value"),
 	Input("expression_dataset_dropdown", "value"),
 	Input("gene_species_dropdown", "value"),
-	#zoom
-	Input("umap_metadata", "relayoutData"),
-	Input("umap_expression", "relayoutData"),
 	#legend switch and update plots
 	Input("show_legend_metadata_switch", "on"),
 	Input("update_legend_button", "n_clicks"),
 	#states
 	State("contrast_only_switch", "on"),
-	State("umap_metadata", "figure"),
-	State("umap_expression", "figure"),
-	State("legend", "figure")
+	State("legend", "figure"),
+	State("umap_view", "data"),
+	State("umap_zoom", "data"),
+	State("sample_metadata_version", "data")
 )
-def plot_umaps(umap_dataset, metadata, expression_dataset, gene_species, zoom_metadata, zoom_expression, show_legend_switch, update_plots, contrast_only_switch, umap_metadata_fig, umap_expression_fig, legend_fig):
+def plot_umaps(umap_dataset, metadata, expression_dataset, gene_species, show_legend_switch, update_plots, contrast_only_switch, legend_fig, umap_view, umap_zoom, sample_metadata_version):
 	#define contexts
 	ctx = dash.callback_context
 	trigger_id = ctx.triggered[0]["prop_id"]
 	div_height = 535
-	metadata_df = download_from_github("metadata.tsv")
-	metadata_df = pd.read_csv(metadata_df, sep = "\t")
 
-	#function for zoom synchronization
-	def synchronize_zoom(umap_to_update, reference_umap):
-		umap_to_update["layout"]["xaxis"]["range"] = reference_umap["layout"]["xaxis"]["range"]
-		umap_to_update["layout"]["yaxis"]["range"] = reference_umap["layout"]["yaxis"]["range"]
-		umap_to_update["layout"]["xaxis"]["autorange"] = reference_umap["layout"]["xaxis"]["autorange"]
-		umap_to_update["layout"]["yaxis"]["autorange"] = reference_umap["layout"]["yaxis"]["autorange"]
+	#function to apply the current zoom to a figure
+	def apply_zoom(umap_fig):
+		for axis in ["xaxis", "yaxis"]:
+			if umap_zoom[axis] is None:
+				umap_fig["layout"][axis]["autorange"] = True
+			else:
+				umap_fig["layout"][axis]["range"] = umap_zoom[axis]
+				umap_fig["layout"][axis]["autorange"] = False
 
-		return umap_to_update
+		return umap_fig
 
 	#function for creating a discrete colored umap from tsv file
 	def plot_umap_discrete(umap_dataset, selected_metadata, show_legend_switch, umap_discrete_fig):
 		#open tsv
 		if umap_dataset == "human":
-			umap_df = download_from_github("data/" + umap_dataset + "/mds/umap.tsv")
+			umap_df = read_tsv("data/" + umap_dataset + "/mds/umap.tsv")
 		else:
-			umap_df = download_from_github("data/" + umap_dataset + "_species/mds/umap.tsv")
-		umap_df = pd.read_csv(umap_df, sep = "\t")
+			umap_df = read_tsv("data/" + umap_dataset + "_species/mds/umap.tsv")
 
 		#prepare df
 		umap_df = umap_df[["sample", "UMAP1", "UMAP2"]]
-		metadata = download_from_github("metadata.tsv")
-		metadata = pd.read_csv(metadata, sep = "\t")
+		metadata = get_metadata()
 		umap_df = pd.merge(umap_df, metadata, how="left", on="sample")
 		umap_df = umap_df.sort_values(by=[selected_metadata])
 		umap_df[selected_metadata] = umap_df[selected_metadata].fillna("NA")
@@ -1994,21 +3357,13 @@ def plot_umaps(umap_dataset, metadata, expression_dataset, gene_species, zoom_me
 		if "NA" in metadata_fields_ordered:
 			old_index = metadata_fields_ordered.index("NA")
 			metadata_fields_ordered.insert(0, metadata_fields_ordered.pop(old_index))
-		#hover template
-		hover_template = ""
-		i = 0
-		columns_to_keep = []
-		for column in umap_df.columns:
-			if column not in ["UMAP1", "UMAP2", "raw_counts", "kraken2", "control"]:
-				columns_to_keep.append(column)
-				hover_template += "{key}: %{{customdata[{i}]}}<br>".format(key=column.replace("_", " ").capitalize(), i=i)
-				i += 1
-		hover_template += "<extra></extra>"
+		#hover template: the points carry the index of their sample, its metadata is written in the text of the points by the browser
+		umap_df["sample_id"] = get_sample_ids(umap_df["Sample"])
+		hover_template = "%{text}<extra></extra>"
 		i = 0
 		for metadata in metadata_fields_ordered:
 			filtered_umap_df = umap_df[umap_df[label_to_value[selected_metadata]] == metadata]
-			custom_data = filtered_umap_df[columns_to_keep]
-			custom_data = custom_data.replace(np.nan, "NA")
+			custom_data = filtered_umap_df[["sample_id"]]
 			marker_color = get_color(metadata, i)
 			umap_discrete_fig.add_trace(go.Scatter(x=filtered_umap_df["UMAP1"], y=filtered_umap_df["UMAP2"], marker_opacity = 1, marker_color = marker_color, marker_size = 4, customdata = custom_data, mode="markers", legendgroup = metadata, showlegend = show_legend_switch, hovertemplate = hover_template, name=metadata))
 			i += 1
@@ -2024,10 +3379,9 @@ def plot_umaps(umap_dataset, metadata, expression_dataset, gene_species, zoom_me
 	def plot_umap_continuous(umap_dataset, expression_dataset, gene_species, samples_to_keep, selected_metadata, colorscale, umap_category, umap_continuous_fig):	
 		#open tsv
 		if umap_dataset == "human":
-			umap_df = download_from_github("data/" + umap_dataset + "/mds/umap.tsv")
+			umap_df = read_tsv("data/" + umap_dataset + "/mds/umap.tsv")
 		else:
-			umap_df = download_from_github("data/" + umap_dataset + "_species/mds/umap.tsv")
-		umap_df = pd.read_csv(umap_df, sep = "\t")
+			umap_df = read_tsv("data/" + umap_dataset + "_species/mds/umap.tsv")
 
 		#expression continuous umap will have counts
 		if umap_category == "expression":
@@ -2037,8 +3391,7 @@ def plot_umaps(umap_dataset, metadata, expression_dataset, gene_species, zoom_me
 			umap_df = umap_df[umap_df["sample"].isin(samples_to_keep)]
 
 			#download counts
-			counts = download_from_github("data/" + expression_dataset + "/counts/" + gene_species + ".tsv")
-			counts = pd.read_csv(counts, sep = "\t")
+			counts = read_counts(expression_dataset, gene_species)
 
 			#add counts to umap df
 			umap_df = umap_df.merge(counts, how="outer", on="sample")
@@ -2056,8 +3409,7 @@ def plot_umaps(umap_dataset, metadata, expression_dataset, gene_species, zoom_me
 		#metadata continuous umap will use the metadata without counts
 		elif umap_category == "metadata":
 			umap_df = umap_df[["sample", "UMAP1", "UMAP2"]]
-			metadata_df = download_from_github("metadata.tsv")
-			metadata_df = pd.read_csv(metadata_df, sep = "\t")
+			metadata_df = get_metadata()
 			umap_df = pd.merge(umap_df, metadata_df, how="left", on="sample")
 			continuous_variable_to_plot = label_to_value[selected_metadata]
 			colorbar_title = label_to_value[selected_metadata]
@@ -2065,32 +3417,28 @@ def plot_umaps(umap_dataset, metadata, expression_dataset, gene_species, zoom_me
 		#rename columns
 		umap_df = umap_df.rename(columns=label_to_value)
 
-		#hovertemplate
-		hover_template = ""
-		i = 0
-		columns_to_keep = []
-		for column in umap_df.columns:
-			if column not in ["UMAP1", "UMAP2", "raw_counts", "kraken2", "control", "counts"]:
-				columns_to_keep.append(column)
-				hover_template += "{key}: %{{customdata[{i}]}}<br>".format(key=column.replace("_", " ").capitalize(), i=i)
-				i += 1
-		hover_template += "<extra></extra>"
+		#hovertemplate: the points carry the index of their sample, its metadata is written in the text of the points by the browser
+		umap_df["sample_id"] = get_sample_ids(umap_df["Sample"])
+		if umap_category == "expression":
+			columns_to_keep = ["sample_id", "Log2 expression"]
+			hover_template = "%{text}Log2 expression: %{customdata[1]}<br><extra></extra>"
+		else:
+			columns_to_keep = ["sample_id"]
+			hover_template = "%{text}<extra></extra>"
 
 		#fill nan with NA
 		umap_df[continuous_variable_to_plot] = umap_df[continuous_variable_to_plot].fillna("NA")
 		
 		#select only NA values
 		na_df = umap_df.loc[umap_df[continuous_variable_to_plot] == "NA"]
-		custom_data = na_df[columns_to_keep]
-		custom_data = custom_data.replace(np.nan, "NA")
+		custom_data = na_df[columns_to_keep].astype(object)
 		
 		#add discrete trace for NA values
 		umap_continuous_fig.add_trace(go.Scatter(x=na_df["UMAP1"], y=na_df["UMAP2"], marker_color=na_color, marker_size=4, customdata=custom_data, mode="markers", showlegend=False, hovertemplate=hover_template, visible=True))
 		
 		#select only not NA
 		umap_df = umap_df.loc[umap_df[continuous_variable_to_plot] != "NA"]
-		custom_data = umap_df[columns_to_keep]
-		custom_data = custom_data.replace(np.nan, "NA")
+		custom_data = umap_df[columns_to_keep].astype(object)
 		marker_color = umap_df[continuous_variable_to_plot]
 		#add continuous trace
 		umap_continuous_fig.add_trace(go.Scatter(x=umap_df["UMAP1"], y=umap_df["UMAP2"], marker_color=marker_color, marker_colorscale=colorscale, marker_showscale=True, marker_opacity=1, marker_size=4, marker_colorbar_title=colorbar_title, marker_colorbar_title_side="right", marker_colorbar_title_font_size=14, mode="markers", customdata=custom_data, hovertemplate=hover_template, showlegend=False, visible=True))
@@ -2103,90 +3451,37 @@ def plot_umaps(umap_dataset, metadata, expression_dataset, gene_species, zoom_me
 		return umap_continuous_fig
 
 	#function to get samples to keep from visibility status in umap_metadata_fig
-	def get_samples_to_keep(umap_metadata_fig):
-		samples_to_keep = []
+	def get_samples_to_keep(umap_dataset, umap_metadata_fig):
+		sample_ids = []
 		#parse metadata figure data 
 		for trace in umap_metadata_fig["data"]:
-			if trace["visible"] is True:
-				for dot in trace["customdata"]:
-					#stores samples to keep after filtering
-					samples_to_keep.append(dot[0])
-		return samples_to_keep
-	
-	##### UMAP METADATA #####
-
-	#change dataset or metadata: create a new figure from tsv
-	if trigger_id in ["umap_dataset_dropdown.value", "metadata_dropdown.value"] or umap_metadata_fig is None:
-
-		#preserve old zoom
-		keep_old_zoom = False
-		if umap_metadata_fig is not None:
-			xaxis_range = umap_metadata_fig["layout"]["xaxis"]["range"]
-			yaxis_range = umap_metadata_fig["layout"]["yaxis"]["range"]
-			keep_old_zoom = True
-		if trigger_id in ["umap_dataset_dropdown.value", "metadata_dropdown.value"] and umap_metadata_fig is not None:
-			keep_old_zoom = False
-			umap_metadata_fig["layout"]["xaxis"]["autorange"] = True
-			umap_metadata_fig["layout"]["yaxis"]["autorange"] = True
-
-		#create figure from tsv
-		umap_metadata_fig = go.Figure()
-		if str(metadata_df.dtypes[metadata]) == "object":
-			umap_metadata_fig = plot_umap_discrete(umap_dataset, metadata, show_legend_switch, umap_metadata_fig)
-		else:
-			samples_to_keep = "all"
-			umap_metadata_fig = plot_umap_continuous(umap_dataset, expression_dataset, gene_species, samples_to_keep, metadata, "blues", "metadata", umap_metadata_fig)
-
-		#apply legend trace visibility
-		for i in range(0, len(legend_fig["data"])):
-			if legend_fig["data"][i]["visible"] is True:
-				umap_metadata_fig["data"][i]["visible"] = True
+			if trace["visible"] is True and len(trace["customdata"]) > 0:
+				#sample index is the first column of custom data
+				sample_ids.extend(np.asarray(trace["customdata"])[:, 0].tolist())
+		sample_ids = np.asarray(sample_ids, dtype=int)
+		metadata_samples = get_metadata()["sample"]
+		samples_to_keep = metadata_samples.to_numpy()[sample_ids[sample_ids >= 0]].tolist()
+		#samples without metadata have no index and are all in the NA trace: keep them when it is visible
+		if (sample_ids < 0).any():
+			if umap_dataset == "human":
+				umap_samples = read_tsv("data/" + umap_dataset + "/mds/umap.tsv", copy=False)["sample"]
 			else:
-				umap_metadata_fig["data"][i]["visible"] = False
-
-		#apply old zoom if present
-		if keep_old_zoom:
-			umap_metadata_fig["layout"]["xaxis"]["range"] = xaxis_range
-			umap_metadata_fig["layout"]["yaxis"]["range"] = yaxis_range
-			umap_metadata_fig["layout"]["xaxis"]["autorange"] = False
-			umap_metadata_fig["layout"]["yaxis"]["autorange"] = False
+				umap_samples = read_tsv("data/" + umap_dataset + "_species/mds/umap.tsv", copy=False)["sample"]
+			samples_to_keep.extend(umap_samples[~umap_samples.isin(metadata_samples)].tolist())
+		return samples_to_keep
 	
-	#change umap expression means just to update the zoom
-	elif trigger_id == "umap_expression.relayoutData":
-		umap_metadata_fig = synchronize_zoom(umap_metadata_fig, umap_expression_fig)
+	##### VIEW #####
 
-	#get df and change visibility of traces
-	elif trigger_id == "update_legend_button.n_clicks":
-		for i in range(0, len(legend_fig["data"])):
-			umap_metadata_fig["data"][i]["visible"] = legend_fig["data"][i]["visible"]
+	#the figures are rebuilt from cached data: the browser sends back only the zoom, height and trace visibility of the umaps
+	update_umap_metadata = True
+	update_umap_expression = True
+	if umap_zoom is None:
+		umap_zoom = {"xaxis": None, "yaxis": None}
 
-	##### UMAP EXPRESSION #####
-
-	#change umap dataset, expression dataset or gene/species: create a new figure from tsv
-	if trigger_id in ["umap_dataset_dropdown.value", "expression_dataset_dropdown.value", "gene_species_dropdown.value", "metadata_dropdown.value"] or umap_expression_fig is None:
-
-		#preserve old zoom
-		keep_old_zoom = False
-		if umap_expression_fig is not None:
-			xaxis_range = umap_expression_fig["layout"]["xaxis"]["range"]
-			yaxis_range = umap_expression_fig["layout"]["yaxis"]["range"]
-			keep_old_zoom = True
-		if trigger_id in ["umap_dataset_dropdown.value", "metadata_dropdown.value"]:
-			keep_old_zoom = False
-			umap_metadata_fig["layout"]["xaxis"]["autorange"] = True
-			umap_metadata_fig["layout"]["yaxis"]["autorange"] = True
-
-		samples_to_keep = get_samples_to_keep(umap_metadata_fig)
-		#create figure
-		umap_expression_fig = go.Figure()
-		umap_expression_fig = plot_umap_continuous(umap_dataset, expression_dataset, gene_species, samples_to_keep, metadata, "reds", "expression", umap_expression_fig)
-
-		#apply old zoom if present
-		if keep_old_zoom:
-			umap_expression_fig["layout"]["xaxis"]["range"] = xaxis_range
-			umap_expression_fig["layout"]["yaxis"]["range"] = yaxis_range
-			umap_expression_fig["layout"]["xaxis"]["autorange"] = False
-			umap_expression_fig["layout"]["yaxis"]["autorange"] = False
+	#change dataset or metadata: new figures with autorange and legend trace visibility
+	if trigger_id in ["umap_dataset_dropdown.value", "metadata_dropdown.value"] or umap_view is None:
+		umap_view = {"height": div_height, "visible": [trace["visible"] is True for trace in legend_fig["data"]]}
+		umap_zoom = {"xaxis": None, "yaxis": None}
 
 		#adjust height with show legend and contrast only are true
 		if trigger_id == "metadata_dropdown.value" and show_legend_switch is True:
@@ -2194,40 +3489,26 @@ def plot_umaps(umap_dataset, metadata, expression_dataset, gene_species, zoom_me
 				div_height = 600
 			else:
 				div_height = 770
-			umap_metadata_fig["layout"]["height"] = div_height
+			umap_view["height"] = div_height
 
-	#changes in umap metadata zoom and its legend
-	elif trigger_id in ["show_legend_metadata_switch.on", "update_legend_button.n_clicks", "umap_metadata.relayoutData"]:
+	#change expression dataset or gene/species: only umap expression is updated
+	elif trigger_id in ["expression_dataset_dropdown.value", "gene_species_dropdown.value"]:
+		update_umap_metadata = False
 
-		#select samples to filter
+	#changes in umap metadata legend
+	elif trigger_id in ["show_legend_metadata_switch.on", "update_legend_button.n_clicks"]:
 		visible_count = 0
 		if trigger_id == "update_legend_button.n_clicks":
-			samples_to_keep = get_samples_to_keep(umap_metadata_fig)
-			#get new filtered umap_expression_fig
-			umap_expression_fig = go.Figure()
-			umap_expression_fig = plot_umap_continuous(umap_dataset, expression_dataset, gene_species, samples_to_keep, metadata, "reds", "expression", umap_expression_fig)
-			#give visible status to all traces
-			for i in range(0, len(legend_fig["data"])):
-				if legend_fig["data"][i]["visible"] is True:
-					if show_legend_switch is True:
-						visible_count += 1
-					umap_metadata_fig["data"][i]["visible"] = True
-				else:
-					umap_metadata_fig["data"][i]["visible"] = False
-
-		#show legend switch has changed
-		if trigger_id == "show_legend_metadata_switch.on":
+			#filtered samples in umap expression
+			umap_view["visible"] = [trace["visible"] is True for trace in legend_fig["data"]]
+			if show_legend_switch is True:
+				visible_count = sum(umap_view["visible"])
+		else:
+			update_umap_expression = False
 			#show legend with only selected elements in the legend fig
 			if show_legend_switch is True:
-				for i in range(0, len(legend_fig["data"])):
-					if legend_fig["data"][i]["visible"] is True:
-						visible_count += 1
-					umap_metadata_fig["data"][i]["showlegend"] = True
-			#hide legend
-			elif show_legend_switch is False:
-				for i in range(0, len(legend_fig["data"])):
-					umap_metadata_fig["data"][i]["showlegend"] = False
-		
+				visible_count = sum([trace["visible"] is True for trace in legend_fig["data"]])
+
 		#increase hight of the figure
 		if visible_count == 2:
 			div_height = 600
@@ -2238,35 +3519,56 @@ def plot_umaps(umap_dataset, metadata, expression_dataset, gene_species, zoom_me
 			else:
 				px = 25
 			div_height += lines * px
-		umap_metadata_fig["layout"]["height"] = div_height
+		umap_view["height"] = div_height
 
-		#update zoom from metadata
-		umap_expression_fig = synchronize_zoom(umap_expression_fig, umap_metadata_fig)		
+	##### UMAP METADATA #####
+
+	#create figure from tsv
+	umap_metadata_fig = go.Figure()
+	if is_discrete_metadata(metadata):
+		umap_metadata_fig = plot_umap_discrete(umap_dataset, metadata, show_legend_switch, umap_metadata_fig)
+	else:
+		samples_to_keep = "all"
+		umap_metadata_fig = plot_umap_continuous(umap_dataset, expression_dataset, gene_species, samples_to_keep, metadata, "blues", "metadata", umap_metadata_fig)
+
+	#apply legend trace visibility, height and zoom
+	for trace, visible in zip(umap_metadata_fig["data"], umap_view["visible"]):
+		trace["visible"] = visible
+	umap_metadata_fig["layout"]["height"] = umap_view["height"]
+	umap_metadata_fig = apply_zoom(umap_metadata_fig)
+	samples_to_keep = get_samples_to_keep(umap_dataset, umap_metadata_fig)
+
+	##### UMAP EXPRESSION #####
+
+	if update_umap_expression:
+		#create figure
+		umap_expression_fig = go.Figure()
+		umap_expression_fig = plot_umap_continuous(umap_dataset, expression_dataset, gene_species, samples_to_keep, metadata, "reds", "expression", umap_expression_fig)
+		umap_expression_fig = apply_zoom(umap_expression_fig)
 		
 	##### NUMBER OF DISPLAYED SAMPLES #####
-	def get_displayed_samples(figure_data):
-		x_range = figure_data["layout"]["xaxis"]["range"]
-		y_range = figure_data["layout"]["yaxis"]["range"]
-		n_samples = 0
-		#parse only visible traces
-		for trace in figure_data["data"]:
-			if trace["visible"] is True:
-				#start of the app: give an artificial big range for axes
-				if x_range is None or y_range is None:
-					x_range = [-100, 100]
-					y_range = [-100, 100]
-				#check all points
-				for i in range(0, len(trace["x"])):
-					x = trace["x"][i]
-					y = trace["y"][i]
-					if x is not None and y is not None:
-						if x > x_range[0] and x < x_range[1] and y > y_range[0] and y < y_range[1]:
-							n_samples += 1
-
-		return n_samples
-
-	n_samples_umap_metadata = get_displayed_samples(umap_metadata_fig)
-	n_samples_umap_expression = get_displayed_samples(umap_expression_fig)
+	#function to count the samples inside the zoom from the umap coordinates
+	def get_displayed_samples(samples):
+		if umap_dataset == "human":
+			umap_df = read_tsv("data/" + umap_dataset + "/mds/umap.tsv")
+		else:
+			umap_df = read_tsv("data/" + umap_dataset + "_species/mds/umap.tsv")
+		x_range = umap_zoom["xaxis"]
+		y_range = umap_zoom["yaxis"]
+		#start of the app or autorange: give an artificial big range for axes
+		if x_range is None or y_range is None:
+			x_range = [-100, 100]
+			y_range = [-100, 100]
+		#nan coordinates are never in range
+		x = umap_df["UMAP1"].to_numpy(dtype=float)
+		y = umap_df["UMAP2"].to_numpy(dtype=float)
+		in_range = (x > x_range[0]) & (x < x_range[1]) & (y > y_range[0]) & (y < y_range[1])
+
+		return int(np.count_nonzero(in_range & umap_df["sample"].isin(samples).to_numpy()))
+
+	#both umaps display the visible samples of umap metadata
+	n_samples_umap_metadata = get_displayed_samples(samples_to_keep)
+	n_samples_umap_expression = n_samples_umap_metadata
 
 	#labels for graph title
 	if expression_dataset == "human":
@@ -2286,7 +3588,8 @@ def plot_umaps(umap_dataset, metadata, expression_dataset, gene_species, zoom_me
 
 	#apply title
 	umap_metadata_fig["layout"]["title"]["text"] = "Sample dispersion within the " + transcriptome_title + " transcriptome multidimensional scaling<br>colored by " + metadata.replace("_", " ") + " metadata n=" + str(n_samples_umap_metadata)
-	umap_expression_fig["layout"]["title"]["text"] = "Sample dispersion within the " + transcriptome_title + " transcriptome multidimensional scaling<br>colored by " + gene_species.replace("_", " ").replace("[", "").replace("]", "") + expression_or_abundance + " n=" + str(n_samples_umap_expression)
+	if update_umap_expression:
+		umap_expression_fig["layout"]["title"]["text"] = "Sample dispersion within the " + transcriptome_title + " transcriptome multidimensional scaling<br>colored by " + gene_species.replace("_", " ").replace("[", "").replace("]", "") + expression_or_abundance + " n=" + str(n_samples_umap_expression)
 
 	##### CONFIG OPTIONS ####
 	config_umap_metadata = {"doubleClick": "autosize", "modeBarButtonsToRemove": ["select2d", "lasso2d", "hoverClosestCartesian", "hoverCompareCartesian", "resetScale2d", "toggleSpikelines"], "toImageButtonOptions": {"format": "png", "width": 500, "height": (div_height - 35), "scale": 5}}
@@ -2296,18 +3599,47 @@ def plot_umaps(umap_dataset, metadata, expression_dataset, gene_species, zoom_me
 	config_umap_expression["toImageButtonOptions"]["filename"] = "TaMMA_umap_{umap_metadata}_colored_by_{gene_species}_{expression_abundance}".format(umap_metadata = umap_dataset, gene_species = gene_species, expression_abundance = "expression" if expression_dataset == "human" else "abundance")
 
 	#div styles
-	if str(metadata_df.dtypes[metadata]) == "object":
+	if is_discrete_metadata(metadata):
 		umap_metadata_div_style = {"width": "46.5%", "height": div_height, "display": "inline-block"}
 		umap_expression_div_style = {"width": "53.5%", "height": div_height, "display": "inline-block"}
 	else:
 		umap_metadata_div_style = {"width": "50%", "height": div_height, "display": "inline-block"}
 		umap_expression_div_style = {"width": "50%", "height": div_height, "display": "inline-block"}
 
-	return umap_metadata_fig, umap_expression_fig, config_umap_metadata, config_umap_expression, umap_metadata_div_style, umap_expression_div_style
+	#unchanged figures are not sent again
+	if not update_umap_metadata:
+		umap_metadata_fig = dash.no_update
+	if not update_umap_expression:
+		umap_expression_fig = dash.no_update
+
+	#the sample metadata is sent only if the browser has none or a stale one
+	sample_metadata_lookup = get_sample_metadata_lookup()
+	if sample_metadata_version == sample_metadata_lookup["version"]:
+		sample_metadata_lookup = dash.no_update
+		sample_metadata_version = dash.no_update
+	else:
+		sample_metadata_version = sample_metadata_lookup["version"]
+
+	return umap_metadata_fig, umap_expression_fig, config_umap_metadata, config_umap_expression, umap_metadata_div_style, umap_expression_div_style, umap_view, sample_metadata_lookup, sample_metadata_version
+
+#zoom synchronization and number of displayed samples in umaps, the server is not involved in pan and zoom
+app.clientside_callback(
+	ClientsideFunction(namespace="figures", function_name="synchronize_umaps"),
+	Output("umap_metadata", "figure"),
+	Output("umap_expression", "figure"),
+	Output("umap_zoom", "data"),
+	Input("umap_metadata_store", "data"),
+	Input("umap_expression_store", "data"),
+	Input("umap_metadata", "relayoutData"),
+	Input("umap_expression", "relayoutData"),
+	State("umap_zoom", "data"),
+	State("sample_metadata_store", "data")
+)
 
 #plot boxplots callback
 @app.callback(
-	Output("boxplots_graph", "figure"),
+	Output("boxplots_store", "data"),
+	Output("boxplots_legend_store", "data"),
 	Output("boxplots_graph", "config"),
 	Input("expression_dataset_dropdown", "value"),
 	Input("gene_species_dropdown", "value"),
@@ -2316,9 +3648,9 @@ def plot_umaps(umap_dataset, metadata, expression_dataset, gene_species, zoom_me
 	Input("group_by_group_boxplots_switch", "on"),
 	Input("tissue_checkboxes", "value"),
 	State("legend", "figure"),
-	State("boxplots_graph", "figure"),
+	State("boxplots_legend_store", "data")
 )
-def plot_boxplots(expression_dataset, gene, metadata_field, update_plots, group_switch, checkbox_value, legend_fig, box_fig):
+def plot_boxplots(expression_dataset, gene, metadata_field, update_plots, group_switch, checkbox_value, legend_fig, box_legend):
 	#define contexts
 	ctx = dash.callback_context
 	trigger_id = ctx.triggered[0]["prop_id"]
@@ -2332,15 +3664,15 @@ def plot_boxplots(expression_dataset, gene, metadata_field, update_plots, group_
 	#general config for boxplots
 	config_boxplots = {"modeBarButtonsToRemove": ["select2d", "lasso2d", "hoverClosestCartesian", "hoverCompareCartesian", "resetScale2d", "toggleSpikelines"], "toImageButtonOptions": {"format": "png", "width": 450, "height": 400, "scale": 5}}
 
-	#open metadata
-	metadata_df = download_from_github("metadata.tsv")
-	metadata_df = pd.read_csv(metadata_df, sep = "\t")
 	#continuous metadata variable means no plot update
-	if str(metadata_df.dtypes[metadata_field]) != "object":
+	if not is_discrete_metadata(metadata_field):
 		raise PreventUpdate
+	#open metadata
+	metadata_df = get_metadata()
 	metadata_df[metadata_field] = metadata_df[metadata_field].fillna("NA")
 	
 	#filter metadata by the conditions in the legend only if not grouped
+	legend_features = None
 	if group_switch is False and legend_fig is not None:
 		legend_features = []
 		for trace in legend_fig["data"]:
@@ -2348,74 +3680,71 @@ def plot_boxplots(expression_dataset, gene, metadata_field, update_plots, group_
 		metadata_df[metadata_field] = [i.replace("_", " ") for i in metadata_df[metadata_field]]
 		metadata_df = metadata_df[metadata_df[metadata_field].isin(legend_features)]
 
-	#in case of dropdown changes must plot again
-	if trigger_id in ["expression_dataset_dropdown.value", "gene_species_dropdown.value", "metadata_dropdown.value", "group_by_group_boxplots_switch.on", "tissue_checkboxes.value"] or box_fig is None or trigger_id == "update_legend_button.n_clicks" and len(box_fig["data"]) != len(legend_fig["data"]):
-		counts = download_from_github("data/" + expression_dataset + "/counts/" + gene + ".tsv")
-		counts = pd.read_csv(counts, sep = "\t")
-
-		#merge and compute log2 and replace inf with 0
-		metadata_df = metadata_df.merge(counts, how="left", on="sample")
-		metadata_df["Log2 counts"] = np.log2(metadata_df["counts"])
-		metadata_df["Log2 counts"].replace(to_replace = -np.inf, value = 0, inplace=True)
-
-		#group switch parameters
-		if metadata_field == "condition" and group_switch is True or trigger_id == "tissue_checkboxes.value":
-			#traces will be group and on the x axis we plot tissues
-			metadata_field = "group"
-			x = "tissue"
-			#filter tissues for selected checkboxes 
-			metadata_df = metadata_df[metadata_df[x].isin(checkbox_value)]
-			#sort by tissue and remove "_"
-			metadata_df = metadata_df.sort_values(by=[x])
-			metadata_df[x] = [tissue.replace("_", " ") for tissue in metadata_df[x]]
-			#other parameters
-			boxmode = "group"
-			showlegend = True
-			top_margin = 60
-			title_text = gene.replace("_", " ").replace("[", "").replace("]", "") + " {} profiles per ".format(expression_or_abundance) + "tissue, colored by group"
-		else:
-			x = metadata_field
-			boxmode = "overlay"
-			showlegend = False
-			top_margin = 30
-			title_text = gene.replace("_", " ").replace("[", "").replace("]", "") + " {} profiles per ".format(expression_or_abundance) + metadata_field.replace("_", " ")
+	#update legend changes only trace visibility, applied clientside, unless the conditions in the legend have changed
+	if trigger_id == "update_legend_button.n_clicks" and legend_features == box_legend:
+		raise PreventUpdate
 
-		#create figure
-		box_fig = go.Figure()
-		i = 0
-		metadata_fields_ordered = metadata_df[metadata_field].unique().tolist()
-		metadata_fields_ordered.sort()
-		for metadata in metadata_fields_ordered:
-			filtered_metadata = metadata_df[metadata_df[metadata_field] == metadata]
-			#do not plot values for NA
-			if metadata == "NA":
-				y_values = None
-				x_values = None
-			else:
-				y_values = filtered_metadata["Log2 counts"]
-				x_values = filtered_metadata[x]
-			hovertext_labels = "Sample: " + filtered_metadata["sample"] + "<br>Group: " + filtered_metadata["group"] + "<br>Tissue: " + filtered_metadata["tissue"] + "<br>Source: " + filtered_metadata["source"] + "<br>Library prep strategy: " + filtered_metadata["Library prep strategy"]
-			marker_color = get_color(metadata, i)
-			box_fig.add_trace(go.Box(y=y_values, x=x_values, name = metadata, marker_color = marker_color, boxpoints = "all", hovertext = hovertext_labels, hoverinfo = "y+text"))
-			i += 1
-		box_fig.update_traces(marker_size=4, showlegend=showlegend)
-		box_fig.update_layout(title = {"text": title_text, "x": 0.5, "font_size": 14, "y": 0.99}, legend_title_text = None, yaxis_title = "Log2 {}".format(expression_or_abundance), xaxis_automargin=True, yaxis_automargin=True, font_family="Arial", height=400, margin=dict(t=top_margin, b=30, l=5, r=10), boxmode=boxmode, legend_orientation="h", legend_yanchor="bottom", legend_y=1.02, legend_xanchor="center", legend_x=0.45)
+	#open counts
+	counts = read_counts(expression_dataset, gene)
 
-		#define visible status
-		for trace in box_fig["data"]:
-			trace["visible"] = True
+	#merge and compute log2 and replace inf with 0
+	metadata_df = metadata_df.merge(counts, how="left", on="sample")
+	metadata_df["Log2 counts"] = np.log2(metadata_df["counts"])
+	metadata_df["Log2 counts"].replace(to_replace = -np.inf, value = 0, inplace=True)
 
-	#syncronyze legend status with umap metadata
-	if legend_fig is not None and group_switch is False:
-		for i in range(0, len(legend_fig["data"])):
-			box_fig["data"][i]["visible"] = legend_fig["data"][i]["visible"]
+	#group switch parameters
+	if metadata_field == "condition" and group_switch is True or trigger_id == "tissue_checkboxes.value":
+		#traces will be group and on the x axis we plot tissues
+		metadata_field = "group"
+		x = "tissue"
+		#filter tissues for selected checkboxes 
+		metadata_df = metadata_df[metadata_df[x].isin(checkbox_value)]
+		#sort by tissue and remove "_"
+		metadata_df = metadata_df.sort_values(by=[x])
+		metadata_df[x] = [tissue.replace("_", " ") for tissue in metadata_df[x]]
+		#other parameters
+		boxmode = "group"
+		showlegend = True
+		top_margin = 60
+		title_text = gene.replace("_", " ").replace("[", "").replace("]", "") + " {} profiles per ".format(expression_or_abundance) + "tissue, colored by group"
+	else:
+		x = metadata_field
+		boxmode = "overlay"
+		showlegend = False
+		top_margin = 30
+		title_text = gene.replace("_", " ").replace("[", "").replace("]", "") + " {} profiles per ".format(expression_or_abundance) + metadata_field.replace("_", " ")
+
+	#create figure
+	box_fig = go.Figure()
+	i = 0
+	metadata_fields_ordered = metadata_df[metadata_field].unique().tolist()
+	metadata_fields_ordered.sort()
+	for metadata in metadata_fields_ordered:
+		filtered_metadata = metadata_df[metadata_df[metadata_field] == metadata]
+		#do not plot values for NA
+		if metadata == "NA":
+			y_values = None
+			x_values = None
+		else:
+			y_values = filtered_metadata["Log2 counts"]
+			x_values = filtered_metadata[x]
+		hovertext_labels = "Sample: " + filtered_metadata["sample"] + "<br>Group: " + filtered_metadata["group"] + "<br>Tissue: " + filtered_metadata["tissue"] + "<br>Source: " + filtered_metadata["source"] + "<br>Library prep strategy: " + filtered_metadata["Library prep strategy"]
+		marker_color = get_color(metadata, i)
+		box_fig.add_trace(go.Box(y=y_values, x=x_values, name = metadata, marker_color = marker_color, boxpoints = "all", hovertext = hovertext_labels, hoverinfo = "y+text"))
+		i += 1
+	box_fig.update_traces(marker_size=4, showlegend=showlegend)
+	box_fig.update_layout(title = {"text": title_text, "x": 0.5, "font_size": 14, "y": 0.99}, legend_title_text = None, yaxis_title = "Log2 {}".format(expression_or_abundance), xaxis_automargin=True, yaxis_automargin=True, font_family="Arial", height=400, margin=dict(t=top_margin, b=30, l=5, r=10), boxmode=boxmode, legend_orientation="h", legend_yanchor="bottom", legend_y=1.02, legend_xanchor="center", legend_x=0.45)
+
+	#define visible status
+	for trace in box_fig["data"]:
+		trace["visible"] = True
 
 	#plot name when saving
 	config_boxplots["toImageButtonOptions"]["filename"] = "TaMMA_boxplots_with_{gene_species}_{expression_or_abundance}_colored_by_{metadata}".format(gene_species = gene, expression_or_abundance = expression_or_abundance, metadata = metadata_field)
 
 	#box_fig["layout"]["paper_bgcolor"] = "#BCBDDC"
 
-	return box_fig, config_boxplots
+	return box_fig, legend_features, config_boxplots
 
 #plot MA-plot callback
 @app.callback(
@@ -2424,14 +3753,9 @@ def plot_boxplots(expression_dataset, gene, metadata_field, update_plots, group_
 	Input("expression_dataset_dropdown", "value"),
 	Input("contrast_dropdown", "value"),
 	Input("stringency_dropdown", "value"),
-	Input("gene_species_dropdown", "value"),
-	State("ma_plot_graph", "figure")
+	Input("gene_species_dropdown", "value")
 )
-def plot_MA_plot(dataset, contrast, fdr, gene, old_ma_plot_figure):
-
-	#define contexts
-	ctx = dash.callback_context
-	trigger_id = ctx.triggered[0]["prop_id"]
+def plot_MA_plot(dataset, contrast, fdr, gene):
 
 	if dataset == "human":
 		gene_or_species = "Gene"
@@ -2445,49 +3769,12 @@ def plot_MA_plot(dataset, contrast, fdr, gene, old_ma_plot_figure):
 
 	gene = gene.replace("_", " ").replace("[", "").replace("]", "")
 
-	#read tsv if change in dataset or contrast
-	if trigger_id in ["expression_dataset_dropdown.value", "contrast_dropdown.value"] or old_ma_plot_figure is None:
-		table = download_from_github("data/" + dataset + "/dge/" + contrast + ".diffexp.tsv")
-		table = pd.read_csv(table, sep = "\t")
-		table["Gene"] = table["Gene"].fillna("NA")
-		#log2 base mean
-		table["log2_baseMean"] = np.log2(table["baseMean"])
-		#clean gene/species name
-		table["Gene"] = [i.replace("_", " ").replace("[", "").replace("]", "") for i in table["Gene"]]
-
-	#parse existing figure for change in stringency or gene
-	elif trigger_id in ["stringency_dropdown.value", "gene_species_dropdown.value"] and old_ma_plot_figure is not None:
-		figure_data = {}
-		figure_data["Gene"] = []
-		figure_data["padj"] = []
-		figure_data["log2_baseMean"] = []
-		figure_data["log2FoldChange"] = []
-
-		for trace in range(0, len(old_ma_plot_figure["data"])):
-			figure_data["log2_baseMean"].extend(old_ma_plot_figure["data"][trace]["x"])
-			figure_data["log2FoldChange"].extend(old_ma_plot_figure["data"][trace]["y"])
-			for dot in old_ma_plot_figure["data"][trace]["customdata"]:
-				figure_data["Gene"].append(dot[0])
-				if dot[1] == "NA":
-					dot[1] = np.nan
-				figure_data["padj"].append(dot[1])
-		
-		table = pd.DataFrame(figure_data)
-
-	#find DEGs
-	table.loc[(table["padj"] <= fdr) & (table["log2FoldChange"] > 0), "DEG"] = "Up"
-	table.loc[(table["padj"] <= fdr) & (table["log2FoldChange"] < 0), "DEG"] = "Down"
-	table.loc[table["DEG"].isnull(), "DEG"] = "no_DEG"
+	#DEGs and their counts for the selected stringency from the index of the contrast
+	table, up, down = get_degs(dataset, contrast, fdr)
 
 	#replace nan values with NA
 	table = table.fillna(value={"padj": "NA"})
 
-	#count DEGs
-	up = table[table["DEG"] == "Up"]
-	up = len(up["Gene"])
-	down = table[table["DEG"] == "Down"]
-	down = len(down["Gene"])
-
 	#find selected gene
 	table.loc[table["Gene"] == gene, "DEG"] = "selected_gene"
 	table["selected_gene"] = ""
@@ -2594,25 +3881,28 @@ def plot_MA_plot(dataset, contrast, fdr, gene, old_ma_plot_figure):
 @app.callback(
 	Output("go_plot_graph", "figure"),
 	Output("go_plot_graph", "config"),
-	Input("contrast_dropdown", "value"),
-	Input("go_plot_filter_input", "value")
+	Input("go_filter", "data")
 )
-def plot_go_plot(contrast, search_value):
+def plot_go_plot(go_filter):
+	if go_filter is None:
+		raise PreventUpdate
+	contrast = go_filter["contrast"]
+	search_value = go_filter["search_value"]
+
 	#open df
-	go_df = download_from_github("data/human/padj_1e-10/" + contrast + ".merged_go.tsv")
-	go_df = pd.read_csv(go_df, sep = "\t")
+	go_df = read_tsv("data/human/padj_1e-10/" + contrast + ".merged_go.tsv")
 	#filter out useless columns
 	go_df = go_df[["DGE", "Process~name", "P-value", "percentage%"]]
 	#remove duplicate GO categories for up and down
 	go_df.drop_duplicates(subset ="Process~name", keep = False, inplace = True)
 
 	#define search query if present
-	if search_value is not None and search_value != "":
+	if go_filter["process_ids"] is not None:
 		dance = search_value.upper()
 		if dance == "DANCE":
 			raise PreventUpdate
 		else:
-			processes_to_keep = serach_go(search_value, go_df)
+			processes_to_keep = get_go_processes(contrast, go_filter["process_ids"])
 			#filtering
 			go_df = go_df[go_df["Process~name"].isin(processes_to_keep)]
 
@@ -2741,12 +4031,11 @@ def plot_go_plot(contrast, search_value):
 
 #multiboxplots callback
 @app.callback(
-	Output("multi_boxplots_graph", "figure"),
+	Output("multi_boxplots_store", "data"),
 	Output("multi_boxplots_graph", "config"),
 	Output("multi_boxplots_div", "hidden"),
 	Output("popover_plot_multiboxplots", "is_open"),
 	Output("multiboxplot_div", "style"),
-	Input("update_legend_button", "n_clicks"),
 	Input("update_multixoplot_plot_button", "n_clicks"),
 	Input("metadata_dropdown", "value"),
 	Input("group_by_group_multiboxplots_switch", "on"),
@@ -2754,17 +4043,17 @@ def plot_go_plot(contrast, search_value):
 	State("gene_species_multi_boxplots_dropdown", "value"),
 	State("expression_dataset_dropdown", "value"),
 	State("legend", "figure"),
-	State("multi_boxplots_graph", "figure"),
 	State("multi_boxplots_div", "hidden"),
 	prevent_initial_call=True
 )
-def plot_multiboxplots(n_clicks_general, n_clicks_multiboxplots, metadata_field, group_switch, multicheckbox_value, selected_genes_species, expression_dataset, legend_fig, box_fig, hidden_status):
+def plot_multiboxplots(n_clicks_multiboxplots, metadata_field, group_switch, multicheckbox_value, selected_genes_species, expression_dataset, legend_fig, hidden_status):
 	# CIT; NDC80; AURKA; PPP1R12A; XRCC2; RGS14; ENSA; AKAP8; BUB1B; TADA3
 	#define contexts
 	ctx = dash.callback_context
 	trigger_id = ctx.triggered[0]["prop_id"]
 	
 	#default values used when the figure is hidden
+	box_fig = dash.no_update
 	height_fig = 450
 	title_text = ""
 
@@ -2774,168 +4063,156 @@ def plot_multiboxplots(n_clicks_general, n_clicks_multiboxplots, metadata_field,
 		popover_status = False
 	#filled dropdown
 	else:
-		#change umap legend
-		if trigger_id == "update_legend_button.n_clicks":
-			popover_status = False
-			#identify how many plots there are
-			n_plots = len(selected_genes_species)
-			i = 0
-			for plot in range(0, n_plots):
-				actual_traces_to_change = [trace + i for trace in range(0, len(legend_fig["data"]))]
-				#apply each change
-				for n in range(0, len(legend_fig["data"])):
-					box_fig["data"][actual_traces_to_change[n]]["visible"] = legend_fig["data"][n]["visible"]
-				i += len(legend_fig["data"])
-		#any other change
-		elif trigger_id != "update_legend_button.n_clicks":
-			#up to 10 elements to plot
-			if len(selected_genes_species) < 11:
-
-				#create figure
-				box_fig = go.Figure()
-				
-				#define number of rows
-				if (len(selected_genes_species) % 2) == 0:
-					n_rows = len(selected_genes_species)/2
-				else:
-					n_rows = int(len(selected_genes_species)/2) + 1
-				n_rows = int(n_rows)
-
-				#vertical spacing and legend positioning
-				if n_rows > 3:
-					vertical_spacing = 0.04
-					if n_rows == 5:
-						legend_y=1.05
-					elif n_rows == 4:
-						legend_y=1.07
-				elif n_rows == 3:
-					vertical_spacing = 0.07
-					legend_y=1.10
-				elif n_rows < 3:
-					if n_rows == 2:
-						legend_y=1.15
-					elif n_rows == 1:
-						legend_y = 1.26
-					vertical_spacing = 0.1
-
-				#define specs for subplot
-				specs = []
-				for i in range(0, n_rows):
-					specs.append([{}, {}])
-				#in case of odd number of selected elements, the last plot in grid is None
-				if (len(selected_genes_species) % 2) != 0:
-					specs[-1][-1] = None
-
-				#make subplots
-				if expression_dataset == "human":
-					expression_or_abundance = "expression"
-				else:
-					expression_or_abundance = "abundance"
-				box_fig = make_subplots(rows=n_rows, cols=2, specs=specs, subplot_titles=[gene.replace("[", "").replace("]", "").replace("_", " ") for gene in selected_genes_species], shared_xaxes=True, vertical_spacing=vertical_spacing, y_title="Log2 {}".format(expression_or_abundance))
-				
-				#open metadata
-				metadata_df_original = download_from_github("metadata.tsv")
-				metadata_df_original = pd.read_csv(metadata_df_original, sep = "\t")
-
-				#parameters for group by switch
-				if metadata_field == "condition" and group_switch is True or trigger_id == "tissue_checkboxes.value":
-					grouped_boxplots = True
-					metadata_field = "group"
-					tissues = metadata_df_original[metadata_field].unique().tolist()
-					x = "tissue"
-					boxmode = "group"
-					showlegend=True
-					margin_t = 110
-				else:
-					grouped_boxplots = False
-					x = metadata_field
-					boxmode = "overlay"
-					showlegend=False
-					margin_t = 75
-
-				#loop 1 plot per gene
-				working_row = 1
-				working_col = 1
-				for gene in selected_genes_species:
-					#open counts
-					counts = download_from_github("data/" + expression_dataset + "/counts/" + gene + ".tsv")
-					counts = pd.read_csv(counts, sep = "\t")
-					#merge and compute log2 and replace inf with 0
-					metadata_df = metadata_df_original.merge(counts, how="left", on="sample")
-					metadata_df["Log2 counts"] = np.log2(metadata_df["counts"])
-					metadata_df["Log2 counts"].replace(to_replace = -np.inf, value = 0, inplace=True)
-					#clean metadata field column
-					metadata_df[metadata_field] = [i.replace("_", " ") for i in metadata_df[metadata_field]]
-					
-					#group by switch operations
-					visible_traces = []
-					if grouped_boxplots is True:
-						#filter tissues for selected checkboxes 
-						metadata_df = metadata_df[metadata_df[x].isin(multicheckbox_value)]
-						metadata_df[x] = [i.replace("_", " ") for i in metadata_df[x]]
-						#sort by tissue
-						metadata_df = metadata_df.sort_values(by=[x])
-						for tissue in tissues:
-							visible_traces.append(tissue)
-					#visible traces in umap metadata legend are the one to plot
-					else:
-						for trace in legend_fig["data"]:
-							if trace["visible"] is True:
-								visible_traces.append(trace["name"])
+		#up to 10 elements to plot
+		if len(selected_genes_species) < 11:
 
-					#plot
-					metadata_fields_ordered = metadata_df[metadata_field].unique().tolist()
-					metadata_fields_ordered.sort()
-					i = 0
-					for metadata in metadata_fields_ordered:
-						#visible setting
-						if metadata in visible_traces:
-							visible_status = True
-						else:
-							visible_status = False
-						
-						filtered_metadata = metadata_df[metadata_df[metadata_field] == metadata]
-						hovertext_labels = "Sample: " + filtered_metadata["sample"] + "<br>Group: " + filtered_metadata["group"] + "<br>Tissue: " + filtered_metadata["tissue"] + "<br>Source: " + filtered_metadata["source"] + "<br>Library prep strategy: " + filtered_metadata["Library prep strategy"]
-						box_fig.add_trace(go.Box(x=filtered_metadata[x], y=filtered_metadata["Log2 counts"], name=metadata, marker_color=colors[i], boxpoints="all", hovertext=hovertext_labels, hoverinfo="y+text", visible=visible_status, legendgroup=metadata, showlegend=showlegend, offsetgroup=metadata), row=int(working_row), col=working_col)
-						i += 1
-
-					#just one legend for trece showed is enough
-					if showlegend is True:
-						showlegend = False
-
-					#row and column count
-					working_row += 0.5
-					if working_col == 1:
-						working_col = 2
-					elif working_col == 2:
-						working_col = 1
-
-				#update all traces markers
-				box_fig.update_traces(marker_size=4)
-				#compute height
-				if n_rows == 1:
-					height_fig = 450
-				else:
-					height_fig = n_rows*300
-				#add title and set height
+			#create figure
+			box_fig = go.Figure()
+			
+			#define number of rows
+			if (len(selected_genes_species) % 2) == 0:
+				n_rows = len(selected_genes_species)/2
+			else:
+				n_rows = int(len(selected_genes_species)/2) + 1
+			n_rows = int(n_rows)
+
+			#vertical spacing and legend positioning
+			if n_rows > 3:
+				vertical_spacing = 0.04
+				if n_rows == 5:
+					legend_y=1.05
+				elif n_rows == 4:
+					legend_y=1.07
+			elif n_rows == 3:
+				vertical_spacing = 0.07
+				legend_y=1.10
+			elif n_rows < 3:
+				if n_rows == 2:
+					legend_y=1.15
+				elif n_rows == 1:
+					legend_y = 1.26
+				vertical_spacing = 0.1
+
+			#define specs for subplot
+			specs = []
+			for i in range(0, n_rows):
+				specs.append([{}, {}])
+			#in case of odd number of selected elements, the last plot in grid is None
+			if (len(selected_genes_species) % 2) != 0:
+				specs[-1][-1] = None
+
+			#make subplots
+			if expression_dataset == "human":
+				expression_or_abundance = "expression"
+			else:
+				expression_or_abundance = "abundance"
+			box_fig = make_subplots(rows=n_rows, cols=2, specs=specs, subplot_titles=[gene.replace("[", "").replace("]", "").replace("_", " ") for gene in selected_genes_species], shared_xaxes=True, vertical_spacing=vertical_spacing, y_title="Log2 {}".format(expression_or_abundance))
+			
+			#open metadata
+			metadata_df_original = get_metadata()
+
+			#parameters for group by switch
+			if metadata_field == "condition" and group_switch is True or trigger_id == "tissue_checkboxes.value":
+				grouped_boxplots = True
+				metadata_field = "group"
+				tissues = metadata_df_original[metadata_field].unique().tolist()
+				x = "tissue"
+				boxmode = "group"
+				showlegend=True
+				margin_t = 110
+			else:
+				grouped_boxplots = False
+				x = metadata_field
+				boxmode = "overlay"
+				showlegend=False
+				margin_t = 75
+
+			#open counts of all genes at once, one column per gene aligned to the metadata samples
+			counts = read_counts_many(expression_dataset, selected_genes_species)
+			counts = counts.pivot(index="sample", columns="gene", values="counts")
+			counts = counts.reindex(index=metadata_df_original["sample"], columns=selected_genes_species).to_numpy()
+			#compute log2 and replace inf with 0
+			with np.errstate(divide="ignore"):
+				log2_counts = np.log2(counts)
+			log2_counts[log2_counts == -np.inf] = 0
+			#clean metadata field column
+			metadata_df_original[metadata_field] = [i.replace("_", " ") for i in metadata_df_original[metadata_field]]
+
+			#loop 1 plot per gene
+			working_row = 1
+			working_col = 1
+			for gene_index, gene in enumerate(selected_genes_species):
+				metadata_df = metadata_df_original.assign(**{"counts": counts[:, gene_index], "Log2 counts": log2_counts[:, gene_index]})
+				
+				#group by switch operations
+				visible_traces = []
 				if grouped_boxplots is True:
-					metadata_field = "tissue"
-					extra_text = ", colored by group"
+					#filter tissues for selected checkboxes 
+					metadata_df = metadata_df[metadata_df[x].isin(multicheckbox_value)]
+					metadata_df[x] = [i.replace("_", " ") for i in metadata_df[x]]
+					#sort by tissue
+					metadata_df = metadata_df.sort_values(by=[x])
+					for tissue in tissues:
+						visible_traces.append(tissue)
+				#visible traces in umap metadata legend are the one to plot
 				else:
-					extra_text = ""
-				if expression_dataset == "human":
-					title_text = "Host gene expression profiles per " + metadata_field.replace("_", " ")
-				else:
-					title_text = "{} abundance profiles per ".format(expression_dataset.replace("_", " ").replace("viruses", "viral").capitalize()) + metadata_field.replace("_", " ")
-				#update layout
-				box_fig.update_layout(height=height_fig, title = {"text": title_text + extra_text, "x": 0.5, "y": 0.98, "font_size": 14}, font_family="Arial", margin_r=10, boxmode=boxmode, legend_orientation="h", legend_y=legend_y, legend_xanchor="center", legend_x=0.47, margin_t=margin_t)
+					for trace in legend_fig["data"]:
+						if trace["visible"] is True:
+							visible_traces.append(trace["name"])
 
-				popover_status = False
-				hidden_status = False
-			#more then 10 elements to plot
+				#plot
+				metadata_fields_ordered = metadata_df[metadata_field].unique().tolist()
+				metadata_fields_ordered.sort()
+				i = 0
+				for metadata in metadata_fields_ordered:
+					#visible setting
+					if metadata in visible_traces:
+						visible_status = True
+					else:
+						visible_status = False
+					
+					filtered_metadata = metadata_df[metadata_df[metadata_field] == metadata]
+					hovertext_labels = "Sample: " + filtered_metadata["sample"] + "<br>Group: " + filtered_metadata["group"] + "<br>Tissue: " + filtered_metadata["tissue"] + "<br>Source: " + filtered_metadata["source"] + "<br>Library prep strategy: " + filtered_metadata["Library prep strategy"]
+					box_fig.add_trace(go.Box(x=filtered_metadata[x], y=filtered_metadata["Log2 counts"], name=metadata, marker_color=colors[i], boxpoints="all", hovertext=hovertext_labels, hoverinfo="y+text", visible=visible_status, legendgroup=metadata, showlegend=showlegend, offsetgroup=metadata), row=int(working_row), col=working_col)
+					i += 1
+
+				#just one legend for trece showed is enough
+				if showlegend is True:
+					showlegend = False
+
+				#row and column count
+				working_row += 0.5
+				if working_col == 1:
+					working_col = 2
+				elif working_col == 2:
+					working_col = 1
+
+			#update all traces markers
+			box_fig.update_traces(marker_size=4)
+			#compute height
+			if n_rows == 1:
+				height_fig = 450
+			else:
+				height_fig = n_rows*300
+			#add title and set height
+			if grouped_boxplots is True:
+				metadata_field = "tissue"
+				extra_text = ", colored by group"
 			else:
-				hidden_status = True
-				popover_status = True
+				extra_text = ""
+			if expression_dataset == "human":
+				title_text = "Host gene expression profiles per " + metadata_field.replace("_", " ")
+			else:
+				title_text = "{} abundance profiles per ".format(expression_dataset.replace("_", " ").replace("viruses", "viral").capitalize()) + metadata_field.replace("_", " ")
+			#update layout
+			box_fig.update_layout(height=height_fig, title = {"text": title_text + extra_text, "x": 0.5, "y": 0.98, "font_size": 14}, font_family="Arial", margin_r=10, boxmode=boxmode, legend_orientation="h", legend_y=legend_y, legend_xanchor="center", legend_x=0.47, margin_t=margin_t)
+
+			popover_status = False
+			hidden_status = False
+		#more then 10 elements to plot
+		else:
+			hidden_status = True
+			popover_status = True
 
 	config_multi_boxplots = {"modeBarButtonsToRemove": ["select2d", "lasso2d", "hoverClosestCartesian", "hoverCompareCartesian", "resetScale2d", "toggleSpikelines"], "toImageButtonOptions": {"format": "png", "width": 900, "height": height_fig, "scale": 5}}
 	config_multi_boxplots["toImageButtonOptions"]["filename"] = "TaMMA_multiboxplots_{title_text}".format(title_text = title_text.replace(" ", "_") + metadata_field)
@@ -2944,13 +4221,24 @@ def plot_multiboxplots(n_clicks_general, n_clicks_multiboxplots, metadata_field,
 
 	return box_fig, config_multi_boxplots, hidden_status, popover_status, multiboxplot_div_style
 
-#evidence callback
-@app.callback(
-	Output("evidence_div_loading", "children"),
-	Output("evidence_div", "hidden"),
-	Input("validation_dropdown", "value")
+#legend visibility in boxplots and multiboxplots, applied clientside to the figures stored by the server
+app.clientside_callback(
+	ClientsideFunction(namespace="figures", function_name="apply_legend_visibility"),
+	Output("boxplots_graph", "figure"),
+	Input("boxplots_store", "data"),
+	Input("update_legend_button", "n_clicks"),
+	State("legend", "figure")
 )
-def populate_evidence_old(validation):
+app.clientside_callback(
+	ClientsideFunction(namespace="figures", function_name="apply_legend_visibility"),
+	Output("multi_boxplots_graph", "figure"),
+	Input("multi_boxplots_store", "data"),
+	Input("update_legend_button", "n_clicks"),
+	State("legend", "figure")
+)
+
+#function to build an evidence panel
+def build_evidence_old(validation):
 	
 	#function for card
 	def card(header, body):
@@ -2992,8 +4280,7 @@ def populate_evidence_old(validation):
 		)
 
 		#open tsv
-		bacteria_phylum = download_from_github("manual/validation/bacteria_phylum.tsv")
-		bacteria_phylum = pd.read_csv(bacteria_phylum, sep = "\t")
+		bacteria_phylum = read_tsv("manual/validation/bacteria_phylum.tsv")
 
 		#get others
 		bacteria_phylum.loc[~bacteria_phylum["phylum"].isin(["Actinobacteria", "Firmicutes", "Proteobacteria", "Bacteroidetes", "Verrucomicrobia"]), "phylum"] = "Others"
@@ -3070,15 +4357,13 @@ def populate_evidence_old(validation):
 		box_fig = make_subplots(rows=2, cols=3, specs=[[{}, {}, {}], [{}, {}, None]], subplot_titles=genes, shared_xaxes=True, y_title="Log2 expression", vertical_spacing=0.2)
 
 		#metadata
-		metadata_df_original = download_from_github("metadata.tsv")
-		metadata_df_original = pd.read_csv(metadata_df_original, sep = "\t")
+		metadata_df_original = get_metadata()
 		working_row = 1
 		working_col = 1
 		showlegend = True
 		for gene in genes:
 			#open counts
-			counts = download_from_github("data/human/counts/" + gene + ".tsv")
-			counts = pd.read_csv(counts, sep = "\t")
+			counts = read_counts("human", gene)
 			#merge and compute log2 and replace inf with 0
 			metadata_df = metadata_df_original.merge(counts, how="left", on="sample")
 			metadata_df["Log2 counts"] = np.log2(metadata_df["counts"])
@@ -3160,8 +4445,7 @@ def populate_evidence_old(validation):
 		working_col = 1
 		for contrast in contrasts:
 			#open df
-			go_df = download_from_github("data/human/padj_1e-10/" + contrast + ".merged_go.tsv")
-			go_df = pd.read_csv(go_df, sep = "\t")
+			go_df = read_tsv("data/human/padj_1e-10/" + contrast + ".merged_go.tsv")
 			#filter out useless columns
 			go_df = go_df[["DGE", "Process~name", "P-value", "percentage%"]]
 			#remove duplicate GO categories for up and down
@@ -3263,15 +4547,13 @@ def populate_evidence_old(validation):
 		box_fig = make_subplots(rows=2, cols=2, specs=[[{}, {}], [{}, {}]], subplot_titles=genes, shared_xaxes=True, y_title="Log2 expression", vertical_spacing=0.1)
 
 		#metadata
-		metadata_df_original = download_from_github("metadata.tsv")
-		metadata_df_original = pd.read_csv(metadata_df_original, sep = "\t")
+		metadata_df_original = get_metadata()
 		working_row = 1
 		working_col = 1
 		showlegend = True
 		for gene in genes:
 			#open counts
-			counts = download_from_github("data/human/counts/" + gene + ".tsv")
-			counts = pd.read_csv(counts, sep = "\t")
+			counts = read_counts("human", gene)
 			#merge and compute log2 and replace inf with 0
 			metadata_df = metadata_df_original.merge(counts, how="left", on="sample")
 			metadata_df["Log2 counts"] = np.log2(metadata_df["counts"])
@@ -3337,8 +4619,7 @@ def populate_evidence_old(validation):
 		showlegend=True
 		i = 1
 		for tissue in ["stools", "colon", "ileum"]:
-			diversity_df = download_from_github("manual/validation/diversity_{}.tsv".format(tissue))
-			diversity_df = pd.read_csv(diversity_df, sep="\t")
+			diversity_df = read_tsv("manual/validation/diversity_{}.tsv".format(tissue))
 			diversity_df["condition"] = [condition.split(" ")[1] for condition in diversity_df["condition"]]
 			conditions = diversity_df["condition"].unique().tolist()
 			conditions.sort()
@@ -3381,11 +4662,9 @@ def populate_evidence_old(validation):
 		## Caudovirales ##
 
 		#create df
-		df = download_from_github("manual/validation/viruses_orders.tsv")
-		df = pd.read_csv(df, sep="\t")
+		df = read_tsv("manual/validation/viruses_orders.tsv")
 		df = df[df["order"] == "Caudovirales"]
-		metadata = download_from_github("metadata.tsv")
-		metadata = pd.read_csv(metadata, sep="\t")
+		metadata = get_metadata()
 		metadata = metadata[["sample", "group", "tissue"]]
 		df = df.merge(metadata, how="inner", on="sample")
 		
@@ -3420,8 +4699,7 @@ def populate_evidence_old(validation):
 		## herpesviridae and hepadnaviridae ##
 
 		#open tsv and data carpentry
-		df = download_from_github("manual/validation/virus_families.tsv")
-		df = pd.read_csv(df, sep="\t", low_memory=False)
+		df = read_tsv("manual/validation/virus_families.tsv", low_memory=False)
 		df = df[["family", "sample", "tissue", "group", "counts"]]
 		tissues = ["Colon", "Ileum"]
 		groups = ["CD", "Control", "UC"]
@@ -3463,8 +4741,7 @@ def populate_evidence_old(validation):
 		betaherpesvirus_box_fig = make_subplots(rows=1, cols=3, specs=[[{}, {}, {}]], y_title="Log2 abundance", column_titles=["Human betaherpesvirus 5", "Human betaherpesvirus 6B", "Human betaherpesvirus 7"])
 		grouped_boxplots = True
 		metadata_field = "group"
-		metadata_df_original = download_from_github("metadata.tsv")
-		metadata_df_original = pd.read_csv(metadata_df_original, sep = "\t")
+		metadata_df_original = get_metadata()
 		tissues = metadata_df_original[metadata_field].unique().tolist()
 		x = "tissue"
 		boxmode = "group"
@@ -3476,8 +4753,7 @@ def populate_evidence_old(validation):
 		working_col = 1
 		for gene in selected_genes_species:
 			#open counts
-			counts = download_from_github("data/viruses_species/counts/" + gene + ".tsv")
-			counts = pd.read_csv(counts, sep = "\t")
+			counts = read_counts("viruses_species", gene)
 			#merge and compute log2 and replace inf with 0
 			metadata_df = metadata_df_original.merge(counts, how="left", on="sample")
 			metadata_df["Log2 abundance"] = np.log2(metadata_df["counts"])
@@ -3575,15 +4851,14 @@ def populate_evidence_old(validation):
 		working_col = 1
 		for contrast in contrasts:
 			#open df
-			go_df = download_from_github("data/human/padj_1e-10/" + contrast + ".merged_go.tsv")
-			go_df = pd.read_csv(go_df, sep = "\t")
+			go_df = read_tsv("data/human/padj_1e-10/" + contrast + ".merged_go.tsv")
 			#filter out useless columns
 			go_df = go_df[["DGE", "Process~name", "P-value", "percentage%"]]
 			#remove duplicate GO categories for up and down
 			go_df.drop_duplicates(subset ="Process~name", keep = False, inplace = True)
 			go_df["go_id"] = [go_id.split("~")[0] for go_id in go_df["Process~name"]]
 			#filter go_categories
-			processes_to_keep = serach_go(search_value, go_df)
+			processes_to_keep = get_go_processes(contrast, search_go(search_value, contrast))
 			#filtering
 			go_df = go_df[go_df["Process~name"].isin(processes_to_keep)]
 			#rename columns
@@ -3706,8 +4981,7 @@ def populate_evidence_old(validation):
 		box_fig = make_subplots(rows=n_rows, cols=2, specs=specs, subplot_titles=[gene.replace("[", "").replace("]", "").replace("_", " ") for gene in selected_genes_species], shared_xaxes=True, vertical_spacing=vertical_spacing, y_title="Log2 {}".format(expression_or_abundance))
 		
 		#open metadata
-		metadata_df_original = download_from_github("metadata.tsv")
-		metadata_df_original = pd.read_csv(metadata_df_original, sep = "\t")
+		metadata_df_original = get_metadata()
 
 		#parameters for group by switch
 		grouped_boxplots = True
@@ -3723,8 +4997,7 @@ def populate_evidence_old(validation):
 		working_col = 1
 		for gene in selected_genes_species:
 			#open counts
-			counts = download_from_github("data/" + expression_dataset + "/counts/" + gene + ".tsv")
-			counts = pd.read_csv(counts, sep = "\t")
+			counts = read_counts(expression_dataset, gene)
 			#merge and compute log2 and replace inf with 0
 			metadata_df = metadata_df_original.merge(counts, how="left", on="sample")
 			metadata_df["Log2 counts"] = np.log2(metadata_df["counts"])
@@ -3793,11 +5066,15 @@ def populate_evidence_old(validation):
 
 #evidence callback
 @app.callback(
-	Output("new_evidence_div_loading", "children"),
-	Output("new_evidence_div", "hidden"),
-	Input("new_evidence_dropdown", "value")
+	Output("evidence_div_loading", "children"),
+	Output("evidence_div", "hidden"),
+	Input("validation_dropdown", "value")
 )
-def populate_evidence_new(validation):
+def populate_evidence_old(validation):
+	return get_derived_data(("evidence_old", validation), lambda: to_json_data(build_evidence_old(validation)), "evidence_old_{}".format(validation))
+
+#function to build a new evidence panel
+def build_evidence_new(validation):
 
 	#function for card
 	def card(header, body):
@@ -3836,8 +5113,7 @@ def populate_evidence_new(validation):
 		for file in ["data/human/mds/umap.tsv", "data/archaea_species/mds/umap.tsv"]:
 
 			#open tsv
-			umap_df = download_from_github(file)
-			umap_df = pd.read_csv(umap_df, sep = "\t")
+			umap_df = read_tsv(file)
 
 			#prepare df
 			selected_metadata = "tissue"
@@ -3901,8 +5177,7 @@ def populate_evidence_new(validation):
 				gene_or_species = dataset.split("_")[1]
 				gene_or_species = gene_or_species.capitalize()
 
-				table = download_from_github("data/archaea_order/dge/{contrast}.diffexp.tsv".format(contrast=contrast))
-				table = pd.read_csv(table, sep = "\t")
+				table = read_tsv("data/archaea_order/dge/{contrast}.diffexp.tsv".format(contrast=contrast))
 				table["Gene"] = table["Gene"].fillna("NA")
 				#log2 base mean
 				table["log2_baseMean"] = np.log2(table["baseMean"])
@@ -3980,8 +5255,7 @@ def populate_evidence_new(validation):
 				gene_or_species = dataset.split("_")[1]
 				gene_or_species = gene_or_species.capitalize()
 
-				table = download_from_github("data/eukaryota_order/dge/{contrast}.diffexp.tsv".format(contrast=contrast))
-				table = pd.read_csv(table, sep = "\t")
+				table = read_tsv("data/eukaryota_order/dge/{contrast}.diffexp.tsv".format(contrast=contrast))
 				table["Gene"] = table["Gene"].fillna("NA")
 				#log2 base mean
 				table["log2_baseMean"] = np.log2(table["baseMean"])
@@ -4043,9 +5317,99 @@ def populate_evidence_new(validation):
 
 	return div_children, hidden
 
+#new evidence callback
+@app.callback(
+	Output("new_evidence_div_loading", "children"),
+	Output("new_evidence_div", "hidden"),
+	Input("new_evidence_dropdown", "value")
+)
+def populate_evidence_new(validation):
+	return get_derived_data(("evidence_new", validation), lambda: to_json_data(build_evidence_new(validation)), "new_evidence_{}".format(validation))
+
+#panels that depend only on the data release, prebuilt by prebuild_figures.py
+def get_artifact_builders():
+	builders = {"snakey": build_snakey_fig, "metadata_table": build_metadata_table}
+	for option in evidence_options:
+		builders["evidence_old_{}".format(option["value"])] = lambda validation=option["value"]: to_json_data(build_evidence_old(validation))
+	for option in new_evidence_options:
+		builders["new_evidence_{}".format(option["value"])] = lambda validation=option["value"]: to_json_data(build_evidence_new(validation))
+
+	return builders
+
+#prebuilt evidence panels are loaded at startup, so that workers forked after loading the app share them
+if artifacts_dir is not None:
+	for option in evidence_options:
+		artifact = load_artifact("evidence_old_{}".format(option["value"]))
+		if artifact is not None:
+			data_cache_put(("evidence_old", option["value"]), artifact)
+	for option in new_evidence_options:
+		artifact = load_artifact("new_evidence_{}".format(option["value"]))
+		if artifact is not None:
+			data_cache_put(("evidence_new", option["value"]), artifact)
+
+#warm-up of the caches with the default view and the most requested data, in a background thread so that the server accepts requests at once
+warmup_enabled = os.environ.get("TAMMA_WARMUP", "1") != "0"
+warmup_contrasts = [contrast for contrast in os.environ.get("TAMMA_WARMUP_CONTRASTS", "Ileum_CD-vs-Ileum_Control").split(",") if contrast != ""]
+warmup_genes = [gene for gene in os.environ.get("TAMMA_WARMUP_GENES", "TNF").split(",") if gene != ""]
+#names of the warmed and failed items, and the process that started the warm-up
+warmup_status = {"done": [], "failed": [], "finished": False, "pid": None}
+warmup_lock = threading.Lock()
+
+#function to list the items to warm up, as name and function loading it in the caches
+def get_warmup_items():
+	items = []
+	#default view first
+	for contrast in warmup_contrasts:
+		items.append(("dge table {}".format(contrast), lambda contrast=contrast: get_dge_table("human", contrast)))
+		items.append(("MA plot {}".format(contrast), lambda contrast=contrast: get_deg_index("human", contrast)))
+		items.append(("GO table {}".format(contrast), lambda contrast=contrast: get_go_index(contrast)))
+	for gene in warmup_genes:
+		items.append(("counts {}".format(gene), lambda gene=gene: read_counts("human", gene)))
+	for option in umap_datasets_options:
+		if option["value"] == "human":
+			file_url = "data/human/mds/umap.tsv"
+		else:
+			file_url = "data/" + option["value"] + "_species/mds/umap.tsv"
+		items.append(("umap {}".format(option["value"]), lambda file_url=file_url: read_tsv(file_url, copy=False)))
+	items.append(("gene list", lambda: read_tsv("manual/genes_list.tsv", header=None, names=["genes"], copy=False)))
+	items.append(("contrast list", lambda: read_tsv("manual/contrast_list_human.tsv", copy=False)))
+
+	return items
+
+def warm_up():
+	for name, load in get_warmup_items():
+		try:
+			load()
+		except Exception as error:
+			warmup_status["failed"].append(name)
+			print("warm-up: {} failed: {}".format(name, error), file=sys.stderr)
+		else:
+			warmup_status["done"].append(name)
+	warmup_status["finished"] = True
+	print("warm-up: {} items warmed ({}), {} failed".format(len(warmup_status["done"]), ", ".join(warmup_status["done"]), len(warmup_status["failed"])), file=sys.stderr)
+
+#function to start the warm-up once per process: a forked worker inherits the caches of its parent but not its threads,
+#so the warm-up never runs at import, where gunicorn --preload would start it in the master only
+def start_warm_up():
+	if not warmup_enabled:
+		return
+	with warmup_lock:
+		if warmup_status["pid"] == os.getpid():
+			return
+		warmup_status.update(done=[], failed=[], finished=False, pid=os.getpid())
+	threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+
+#the gunicorn workers start it once forked (gunicorn.conf.py), the workers of other servers on their first request
+@server.before_request
+def start_worker_warm_up():
+	if warmup_status["pid"] != os.getpid():
+		start_warm_up()
+
 if __name__ == "__main__":
 	import os.path
 
+	start_warm_up()
+
 	if os.path.isfile(".vscode/settings.json"):
 		app.run_server(debug=True, host = "10.39.173.120", port = "8050")
 	else:
@@ -0,0 +1,158 @@
+//clientside callbacks, they update the figures built by the server without sending them back to it
+(function() {
+	window.dash_clientside = Object.assign({}, window.dash_clientside, {
+		figures: {
+			//apply the visibility of the legend traces to the traces with the same name
+			apply_legend_visibility: function(figure, n_clicks, legend) {
+				if (!figure || !figure.data) {
+					return window.dash_clientside.no_update;
+				}
+				//grouped boxplots have a trace per group, not per legend element
+				if (!legend || !legend.data || (figure.layout && figure.layout.boxmode === "group")) {
+					return figure;
+				}
+				var visible = {};
+				legend.data.forEach(function(trace) {
+					if (trace.name !== undefined) {
+						visible[trace.name] = trace.visible;
+					}
+				});
+				var data = figure.data.map(function(trace) {
+					if (trace.name in visible) {
+						return Object.assign({}, trace, {visible: visible[trace.name]});
+					}
+					return trace;
+				});
+				return Object.assign({}, figure, {data: data});
+			},
+
+			//apply the zoom of one umap to both umaps and count the samples they display
+			synchronize_umaps: function(metadata_fig, expression_fig, metadata_relayout, expression_relayout, zoom, sample_metadata) {
+				var no_update = window.dash_clientside.no_update;
+				if (!metadata_fig || !expression_fig) {
+					return [no_update, no_update, no_update];
+				}
+				metadata_fig = add_hover_text(metadata_fig, sample_metadata);
+				expression_fig = add_hover_text(expression_fig, sample_metadata);
+				var triggered = window.dash_clientside.callback_context.triggered.map(function(trigger) {
+					return trigger.prop_id;
+				});
+
+				//figures built by the server already have the current zoom
+				var metadata_store = triggered.indexOf("umap_metadata_store.data") !== -1;
+				var expression_store = triggered.indexOf("umap_expression_store.data") !== -1;
+				if (metadata_store || expression_store) {
+					var layout = (metadata_store ? metadata_fig : expression_fig).layout;
+					return [metadata_store ? metadata_fig : no_update, expression_store ? expression_fig : no_update, {xaxis: get_figure_range(layout, "xaxis"), yaxis: get_figure_range(layout, "yaxis")}];
+				}
+
+				//zoom in one of the umaps
+				var relayout = triggered.indexOf("umap_metadata.relayoutData") !== -1 ? metadata_relayout : expression_relayout;
+				zoom = zoom || {xaxis: null, yaxis: null};
+				var new_zoom = {xaxis: get_relayout_range(relayout, "xaxis", zoom.xaxis), yaxis: get_relayout_range(relayout, "yaxis", zoom.yaxis)};
+				//relayout without zoom, e.g. autosize
+				if (JSON.stringify(new_zoom) === JSON.stringify(zoom)) {
+					return [no_update, no_update, no_update];
+				}
+				return [apply_zoom(metadata_fig, new_zoom), apply_zoom(expression_fig, new_zoom), new_zoom];
+			}
+		}
+	});
+
+	//figures with hover text by figure built by the server, so that zooming does not write the text again
+	var hover_figures = new WeakMap();
+
+	//copy of a umap with the metadata of the sample of each point, whose index is the first column of its custom data, in its hover text
+	function add_hover_text(figure, sample_metadata) {
+		if (!sample_metadata) {
+			return figure;
+		}
+		var cached = hover_figures.get(figure);
+		if (cached && cached.sample_metadata === sample_metadata) {
+			return cached.figure;
+		}
+		var texts = {};
+		var data = figure.data.map(function(trace) {
+			if (!trace.customdata) {
+				return trace;
+			}
+			var text = trace.customdata.map(function(point) {
+				var sample_id = point[0];
+				if (!(sample_id in texts)) {
+					var row = sample_metadata.rows[sample_id];
+					texts[sample_id] = row ? row.map(function(value, i) {
+						return sample_metadata.columns[i] + ": " + value + "<br>";
+					}).join("") : "";
+				}
+				return texts[sample_id];
+			});
+			return Object.assign({}, trace, {text: text});
+		});
+		var hover_figure = Object.assign({}, figure, {data: data});
+		hover_figures.set(figure, {sample_metadata: sample_metadata, figure: hover_figure});
+		return hover_figure;
+	}
+
+	//axis range of a figure, null means autorange
+	function get_figure_range(layout, axis) {
+		if (layout[axis] && layout[axis].autorange === false) {
+			return layout[axis].range;
+		}
+		return null;
+	}
+
+	//axis range after a relayout event, null means autorange
+	function get_relayout_range(relayout, axis, axis_range) {
+		if (!relayout) {
+			return axis_range;
+		}
+		if (relayout[axis + ".autorange"] === true) {
+			return null;
+		}
+		if (axis + ".range[0]" in relayout && axis + ".range[1]" in relayout) {
+			return [relayout[axis + ".range[0]"], relayout[axis + ".range[1]"]];
+		}
+		if (axis + ".range" in relayout) {
+			return relayout[axis + ".range"];
+		}
+		return axis_range;
+	}
+
+	//number of points of the visible traces inside the zoom
+	function count_displayed_samples(figure, zoom) {
+		var x_range = zoom.xaxis;
+		var y_range = zoom.yaxis;
+		//autorange: give an artificial big range for axes
+		if (!x_range || !y_range) {
+			x_range = [-100, 100];
+			y_range = [-100, 100];
+		}
+		var n_samples = 0;
+		figure.data.forEach(function(trace) {
+			if (trace.visible === true) {
+				for (var i = 0; i < trace.x.length; i++) {
+					var x = trace.x[i];
+					var y = trace.y[i];
+					if (x !== null && y !== null && x > x_range[0] && x < x_range[1] && y > y_range[0] && y < y_range[1]) {
+						n_samples++;
+					}
+				}
+			}
+		});
+		return n_samples;
+	}
+
+	//copy of a figure with the zoom applied and the number of displayed samples in its title
+	function apply_zoom(figure, zoom) {
+		var layout = Object.assign({}, figure.layout);
+		["xaxis", "yaxis"].forEach(function(axis) {
+			if (zoom[axis] === null) {
+				layout[axis] = Object.assign({}, layout[axis], {autorange: true});
+			} else {
+				layout[axis] = Object.assign({}, layout[axis], {range: zoom[axis], autorange: false});
+			}
+		});
+		layout.title = Object.assign({}, layout.title, {text: layout.title.text.replace(/n=\d+$/, "n=" + count_displayed_samples(figure, zoom))});
+		return Object.assign({}, figure, {layout: layout});
+	}
+})();
@@ -0,0 +1,338 @@
+import argparse
+import collections
+import functools
+import http.server
+import json
+import os
+import re
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+#benchmark of the dash callbacks on a local copy of the data repository, a snapshot or synthetic data, without network access
+#the callbacks are called through the flask test client with the payloads the browser sends, so that dash dispatch and json encoding are measured too
+#the scenarios run in order in one process: the first call of a scenario fills the caches, the repeats measure the cached path
+
+#default view of the app, also present in the synthetic data
+benchmark_contrast = "Ileum_CD-vs-Ileum_Control"
+benchmark_gene = "TNF"
+benchmark_multiboxplots_genes = ["TNF", "IFNG", "CIT", "NDC80", "AURKA"]
+#regressions smaller than this are noise
+regression_min_delta_ms = 5
+#encodings and levels of the compression benchmark, each payload is compressed a few times
+compression_settings = [("gzip", 1), ("gzip", 6), ("gzip", 9), ("br", 1), ("br", 4), ("br", 6), ("br", 11)]
+compression_repeat = 3
+
+#function to write a synthetic data repository with the layout and the file formats of the real one
+def write_synthetic_data(data_dir, n_samples, n_genes, seed=0):
+	rng = np.random.default_rng(seed)
+
+	def write_tsv(file_url, df, header=True):
+		path = os.path.join(data_dir, file_url)
+		os.makedirs(os.path.dirname(path), exist_ok=True)
+		df.to_csv(path, sep="\t", index=False, header=header)
+
+	tissues = ["Colon", "Ileum", "Rectum", "Stool_associated"]
+	groups = ["CD", "UC", "Control", "PIBD"]
+	samples = ["S{:05d}".format(i) for i in range(n_samples)]
+	tissue = rng.choice(tissues, n_samples)
+	group = rng.choice(groups, n_samples)
+	condition = [sample_tissue + "_" + sample_group for sample_tissue, sample_group in zip(tissue, group)]
+	write_tsv("metadata.tsv", pd.DataFrame({"sample": samples, "group": group, "tissue": tissue, "condition": condition, "source": ["GSE{}_x".format(rng.integers(1000, 1010)) for sample in samples], "Library prep strategy": rng.choice(["polyA", "total"], n_samples), "gender": rng.choice(["Female", "Male", None], n_samples), "age": rng.choice([np.nan, 20, 30, 40, 50], n_samples), "age_at_diagnosis": rng.choice([np.nan, 10, 20], n_samples), "raw_counts": "x", "kraken2": "y", "control": "z"}))
+	write_tsv("manual/stats.tsv", pd.DataFrame({"source": [0, 0, 1], "target": [1, 2, 3], "n": [10, 20, 5]}))
+	write_tsv("manual/labels_list.tsv", pd.DataFrame({"label": ["a", "b_UCB", "c", "d"]}), header=False)
+	contrasts = [benchmark_contrast, "Colon_UC-vs-Colon_Control", "Colon_CD-vs-Colon_Control", "Ileum_UC-vs-Ileum_Control", "Colon_Control-vs-Ileum_Control", "Ileum_CD-vs-Colon_CD", "Colon_UC-vs-Ileum_UC"]
+	contrast_list = pd.DataFrame({"comparison": contrasts, "category": ["same_tissue"] * 4 + ["same_group"] * 3})
+	write_tsv("manual/contrast_list_human.tsv", contrast_list)
+	write_tsv("manual/contrast_list_meta.tsv", contrast_list)
+
+	#genes of the evidence panels first, then random ones
+	human_genes = ["TNF", "IFNG", "IL12B", "ITGA4", "ITGB7", "ACTB", "GAPDH", "GPI", "VPS29", "MIRLET7A1", "MIRLET7A2", "MIRLET7BHG", "MIRLET7C", "MIRLET7D", "MIRLET7DHG", "MIRLET7E", "MIRLET7F1", "MIRLET7F2", "MIRLET7G", "MIRLET7I", "MIR98", "CIT", "NDC80", "AURKA", "PPP1R12A", "XRCC2", "RGS14", "ENSA", "AKAP8", "BUB1B", "TADA3"] + ["G{:05d}".format(i) for i in range(n_genes)]
+	datasets = {"human": human_genes}
+	for kingdom in ["archaea", "bacteria", "eukaryota", "viruses"]:
+		for level in ["order", "family", "species"]:
+			names = ["{}_{}_{}".format(kingdom.capitalize(), level, i) for i in range(60)]
+			if kingdom == "viruses" and level == "species":
+				names = ["Human_betaherpesvirus_5", "Human_betaherpesvirus_6B", "Human_betaherpesvirus_7"] + names
+			datasets[kingdom + "_" + level] = names
+	write_tsv("manual/genes_list.tsv", pd.DataFrame({"gene": human_genes}), header=False)
+	for dataset, names in datasets.items():
+		if dataset != "human":
+			write_tsv("manual/{}_list.tsv".format(dataset), pd.DataFrame({"gene": names}), header=False)
+		for name in names:
+			write_tsv("data/{}/counts/{}.tsv".format(dataset, name), pd.DataFrame({"sample": samples, "counts": rng.gamma(2, 50, n_samples).round(2)}))
+		for contrast in contrasts:
+			n = len(names)
+			padj = rng.uniform(0, 1, n) ** 6
+			padj[rng.uniform(0, 1, n) < 0.05] = np.nan
+			write_tsv("data/{}/dge/{}.diffexp.tsv".format(dataset, contrast), pd.DataFrame({"Gene": names, "Geneid": ["ENSG{:08d}".format(i) for i in range(n)], "baseMean": rng.gamma(2, 100, n), "log2FoldChange": rng.normal(0, 2, n), "lfcSE": rng.uniform(0.1, 1, n), "pvalue": padj / 2, "padj": padj}))
+	for dataset in ["human", "archaea_species", "bacteria_species", "eukaryota_species", "viruses_species"]:
+		write_tsv("data/{}/mds/umap.tsv".format(dataset), pd.DataFrame({"sample": samples, "UMAP1": rng.normal(0, 5, n_samples), "UMAP2": rng.normal(0, 5, n_samples), "group": group, "tissue": tissue, "condition": condition}))
+
+	#go processes of the evidence panels first, then random ones
+	words = ["inflammatory", "response", "epithelial", "endothelial", "cell", "proliferation", "regulation", "of", "T-helper", "JAK-STAT", "cascade", "immune", "signaling", "angiogenesis", "migration"]
+	for contrast in contrasts:
+		rows = []
+		for i in range(300):
+			go_id = 46426 if i == 0 else 42531 if i == 1 else 1000 + i
+			#one name with punctuation around a word, for the search check
+			name = "T cell activation (CD4+)" if i == 2 else " ".join(rng.choice(words, 4))
+			rows.append({"DGE": rng.choice(["up", "down"]), "Genes": "TNF, IFNG", "Process~name": "GO:{:07d}~{}".format(go_id, name), "num_of_Genes": int(rng.integers(2, 50)), "gene_group": int(rng.integers(50, 500)), "percentage%": rng.uniform(1, 40), "P-value": rng.uniform(0, 0.05)})
+		write_tsv("data/human/padj_1e-10/{}.merged_go.tsv".format(contrast), pd.DataFrame(rows))
+
+	#tables of the evidence panels
+	phyla = ["Actinobacteria", "Firmicutes", "Proteobacteria", "Bacteroidetes", "Verrucomicrobia", "Other1"]
+	write_tsv("manual/validation/bacteria_phylum.tsv", pd.DataFrame([{"condition": condition, "phylum": phylum, "counts": rng.uniform(1, 100)} for condition in ["Stool CD", "Stool Control"] for phylum in phyla]))
+	for diversity_tissue in ["stools", "colon", "ileum"]:
+		write_tsv("manual/validation/diversity_{}.tsv".format(diversity_tissue), pd.DataFrame({"condition": rng.choice(["x CD", "x UC", "x Control"], 50), "diversity": rng.uniform(1, 4, 50)}))
+	write_tsv("manual/validation/viruses_orders.tsv", pd.DataFrame({"order": "Caudovirales", "sample": samples, "counts": rng.uniform(0, 1, n_samples)}))
+	write_tsv("manual/validation/virus_families.tsv", pd.DataFrame({"family": rng.choice(["Herpesviridae", "Hepadnaviridae"], n_samples), "sample": samples, "tissue": tissue, "group": group, "counts": rng.uniform(0, 1, n_samples)}))
+
+#request handler serving data_dir at <release>/<file>, the layout of the urls of the data repository
+class DataRequestHandler(http.server.SimpleHTTPRequestHandler):
+	def translate_path(self, path):
+		return super().translate_path("/" + path.lstrip("/").partition("/")[2])
+
+	def log_message(self, format, *args):
+		pass
+
+#function to serve a local data directory in a background thread, returns its url
+def serve_data(data_dir):
+	data_server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(DataRequestHandler, directory=data_dir))
+	threading.Thread(target=data_server.serve_forever, name="data-server", daemon=True).start()
+
+	return "http://127.0.0.1:{}/".format(data_server.server_address[1])
+
+#function to get the request the browser sends to call a callback, values are keyed by "<id>.<property>" and missing ones are None
+def get_callback_payload(app, name, values, changed_props):
+	for key, callback in app.callback_map.items():
+		if "callback" in callback and callback["callback"].__name__ == name:
+			break
+	else:
+		raise KeyError(name)
+
+	def get_spec(dependency):
+		return {"id": dependency["id"], "property": dependency["property"], "value": values.get(dependency["id"] + "." + dependency["property"])}
+
+	outputs = [{"id": output.split(".")[0], "property": output.split(".")[1]} for output in key.strip(".").split("...")]
+
+	return {"output": key, "outputs": outputs if key.startswith("..") else outputs[0], "inputs": [get_spec(dependency) for dependency in callback["inputs"]], "state": [get_spec(dependency) for dependency in callback["state"]], "changedPropIds": changed_props}
+
+#function to call a callback as the browser does, without compression of the response
+#returns the response of the callback, None if it did not update, and the size of the response
+def call_callback(app, client, name, values, changed_props):
+	response = client.post("/_dash-update-component", json=get_callback_payload(app, name, values, changed_props))
+	if response.status_code == 204:
+		return None, 0
+	if response.status_code != 200:
+		raise RuntimeError("{} failed with status {}: {}".format(name, response.status_code, response.data[:1000].decode(errors="replace")))
+
+	return json.loads(response.data)["response"], len(response.data)
+
+#function to get the scenarios as name, callback, input and state values and triggers
+def get_scenarios(app_module, client):
+	legend_values = {"metadata_dropdown.value": "condition", "contrast_only_switch.on": False, "contrast_dropdown.value": benchmark_contrast, "umap_dataset_dropdown.value": "human"}
+	legend_fig = call_callback(app_module.app, client, "legend", legend_values, ["metadata_dropdown.value"])[0]["legend"]["figure"]
+	#legend with the first three conditions only
+	filtered_legend_fig = json.loads(json.dumps(legend_fig))
+	for trace in filtered_legend_fig["data"][3:]:
+		trace["visible"] = "legendonly"
+	go_filter = call_callback(app_module.app, client, "filter_go", {"contrast_dropdown.value": benchmark_contrast, "go_plot_filter_input.value": None}, ["contrast_dropdown.value"])[0]["go_filter"]["data"]
+	searched_go_filter = call_callback(app_module.app, client, "filter_go", {"contrast_dropdown.value": benchmark_contrast, "go_plot_filter_input.value": "epithelial inflammatory"}, ["go_plot_filter_input.value"])[0]["go_filter"]["data"]
+	#words are matched without the punctuation around them, in the process names and in the query
+	for search_value in ["cd4", "(CD4+) T cell"]:
+		if 2 not in app_module.search_go(search_value, benchmark_contrast):
+			raise ValueError("GO search of {} does not find the process named T cell activation (CD4+)".format(search_value))
+
+	#the browser has the sample metadata of the umap hovers after the first call
+	umap_values = {"umap_dataset_dropdown.value": "human", "metadata_dropdown.value": "condition", "expression_dataset_dropdown.value": "human", "gene_species_dropdown.value": benchmark_gene, "show_legend_metadata_switch.on": False, "contrast_only_switch.on": False, "legend.figure": legend_fig, "sample_metadata_version.data": app_module.get_metadata_version()}
+	dge_values = {"contrast_dropdown.value": benchmark_contrast, "expression_dataset_dropdown.value": "human", "stringency_dropdown.value": 1e-10, "dge_table.page_current": 0, "dge_table.sort_by": [], "dge_table.filter_query": "", "dge_table.page_size": 25}
+	multiboxplots_values = {"metadata_dropdown.value": "condition", "group_by_group_multiboxplots_switch.on": False, "tissue_checkboxes_multiboxplots.value": ["Colon", "Ileum"], "gene_species_multi_boxplots_dropdown.value": benchmark_multiboxplots_genes, "expression_dataset_dropdown.value": "human", "legend.figure": legend_fig, "multi_boxplots_div.hidden": True}
+	scenarios = [
+		("plot_umaps:dataset", "plot_umaps", umap_values, ["umap_dataset_dropdown.value"]),
+		("plot_umaps:gene", "plot_umaps", umap_values, ["gene_species_dropdown.value"]),
+		("plot_umaps:legend", "plot_umaps", dict(umap_values, **{"legend.figure": filtered_legend_fig, "show_legend_metadata_switch.on": True}), ["update_legend_button.n_clicks"]),
+		("plot_MA_plot:contrast", "plot_MA_plot", {"expression_dataset_dropdown.value": "human", "contrast_dropdown.value": benchmark_contrast, "stringency_dropdown.value": 1e-10, "gene_species_dropdown.value": benchmark_gene}, ["contrast_dropdown.value"]),
+		("display_dge_table:contrast", "display_dge_table", dge_values, ["contrast_dropdown.value"]),
+		("display_dge_table:sort", "display_dge_table", dict(dge_values, **{"dge_table.sort_by": [{"column_id": "log2 FC", "direction": "desc"}]}), ["dge_table.sort_by"]),
+		("display_metadata_table:load", "display_metadata_table", {"metadata_table.page_current": 0, "metadata_table.sort_by": [], "metadata_table.filter_query": "", "metadata_table.page_size": 25}, ["metadata_table.page_current"]),
+		("plot_multiboxplots:update", "plot_multiboxplots", multiboxplots_values, ["update_multixoplot_plot_button.n_clicks"]),
+		("plot_go_plot:contrast", "plot_go_plot", {"go_filter.data": go_filter}, ["go_filter.data"]),
+		("plot_go_plot:search", "plot_go_plot", {"go_filter.data": searched_go_filter}, ["go_filter.data"])
+	]
+	for option in app_module.evidence_options:
+		scenarios.append(("populate_evidence_old:" + option["value"], "populate_evidence_old", {"validation_dropdown.value": option["value"]}, ["validation_dropdown.value"]))
+	for option in app_module.new_evidence_options:
+		scenarios.append(("populate_evidence_new:" + option["value"], "populate_evidence_new", {"new_evidence_dropdown.value": option["value"]}, ["new_evidence_dropdown.value"]))
+
+	return scenarios
+
+#function to check that the sort columns of a scenario are columns of their table, the app ignores unknown ones
+#the columns are those of the response, or of the layout for tables with fixed columns
+def check_sort_columns(app, values, response):
+	for key, sort_by in values.items():
+		if not key.endswith(".sort_by") or not sort_by:
+			continue
+		table_id = key[:-len(".sort_by")]
+		columns = (response or {}).get(table_id, {}).get("columns")
+		if columns is None:
+			columns = app.layout[table_id].columns
+		column_ids = [column["id"] for column in columns]
+		for sort in sort_by:
+			if sort["column_id"] not in column_ids:
+				raise ValueError("unknown sort column {} of {}, columns are {}".format(sort["column_id"], table_id, ", ".join(column_ids)))
+
+#function to run a scenario, latencies in ms of the first call and of the repeats, and peak python memory in MB of one more (cached) call
+def run_scenario(app, client, callback, values, changed_props, repeat):
+	latencies = []
+	for i in range(repeat + 1):
+		start = time.perf_counter()
+		response, size = call_callback(app, client, callback, values, changed_props)
+		latencies.append((time.perf_counter() - start) * 1000)
+	check_sort_columns(app, values, response)
+	#traced separately, tracing slows down the calls
+	tracemalloc.start()
+	call_callback(app, client, callback, values, changed_props)
+	peak_memory = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+	tracemalloc.stop()
+
+	return {
+		"first_ms": latencies[0],
+		"p50_ms": float(np.percentile(latencies[1:], 50)),
+		"p90_ms": float(np.percentile(latencies[1:], 90)),
+		"p99_ms": float(np.percentile(latencies[1:], 99)),
+		"max_ms": max(latencies[1:]),
+		"peak_mb": peak_memory,
+		"response_kb": size / 1024
+	}
+
+#function to get the uncompressed responses of the scenarios, of the layout and of the scripts of the index page, by group
+def get_payloads(app, client, scenarios):
+	payloads = collections.defaultdict(list)
+	for name, callback, values, changed_props in scenarios:
+		response = client.post("/_dash-update-component", json=get_callback_payload(app, callback, values, changed_props))
+		if response.status_code == 200:
+			payloads["callbacks"].append(response.data)
+	payloads["layout"].append(client.get("/_dash-layout").data)
+	for src in re.findall(r'src="(/[^"]+)"', client.get("/").data.decode()):
+		payloads["static"].append(client.get(src).data)
+
+	return payloads
+
+#function to compress the payloads of each group with each setting, the cpu time is the median of some repeats
+def run_compression(app_module, payloads):
+	results = {}
+	for group, bodies in payloads.items():
+		size = sum([len(body) for body in bodies])
+		for encoding, level in compression_settings:
+			if encoding == "br" and app_module.brotli is None:
+				continue
+			compressed_size = 0
+			cpu_seconds = 0
+			for body in bodies:
+				times = []
+				for i in range(compression_repeat):
+					start = time.process_time()
+					compressed = app_module.compress_body(body, encoding, level)
+					times.append(time.process_time() - start)
+				cpu_seconds += float(np.median(times))
+				compressed_size += len(compressed)
+			results["{}:{}-{}".format(group, encoding, level)] = {
+				"raw_kb": size / 1024,
+				"compressed_kb": compressed_size / 1024,
+				"saved_pct": 100 * (1 - compressed_size / max(size, 1)),
+				"cpu_ms": cpu_seconds * 1000,
+				"mb_per_s": size / 1024 / 1024 / max(cpu_seconds, 1e-9),
+				"configured": encoding in app_module.compression_encodings and level == app_module.compression_levels[encoding]
+			}
+
+	return results
+
+#function to compare results with a baseline, returns the regressions
+def find_regressions(results, baseline, tolerance):
+	regressions = []
+	for name, result in results.items():
+		if name not in baseline:
+			continue
+		for metric in ["p50_ms", "peak_mb"]:
+			limit = baseline[name][metric] * (1 + tolerance)
+			if metric == "p50_ms":
+				limit = max(limit, baseline[name][metric] + regression_min_delta_ms)
+			if result[metric] > limit:
+				regressions.append("{} {}: {:.1f} > {:.1f} (baseline {:.1f})".format(name, metric, result[metric], limit, baseline[name][metric]))
+
+	return regressions
+
+def main():
+	parser = argparse.ArgumentParser(description="Benchmark the dash callbacks on a local copy of the data repository.")
+	parser.add_argument("data_dir", nargs="?", help="local copy of the data repository, synthetic data are used if missing")
+	parser.add_argument("--samples", type=int, default=4000, help="number of samples of the synthetic data")
+	parser.add_argument("--genes", type=int, default=2000, help="number of random human genes of the synthetic data")
+	parser.add_argument("--convert", action="store_true", help="run convert_data.py on the synthetic data, to benchmark the feather files and counts matrices")
+	parser.add_argument("--local", action="store_true", help="read the data directory in place instead of serving it over http")
+	parser.add_argument("--repeat", type=int, default=10, help="number of repeats of each scenario after the first call")
+	parser.add_argument("--only", nargs="+", metavar="SCENARIO", help="run only the scenarios starting with these names")
+	parser.add_argument("--compression", action="store_true", help="compress the responses of the scenarios, the layout and the scripts with each encoding and level, and report the cpu time and the bytes saved")
+	parser.add_argument("--output", help="json file to write the results to, to be used as baseline")
+	parser.add_argument("--baseline", help="json file of previous results, the exit status is 1 if a scenario is slower or uses more memory")
+	parser.add_argument("--tolerance", type=float, default=0.5, help="relative increase of p50 latency and peak memory over the baseline tolerated")
+	args = parser.parse_args()
+
+	work_dir = tempfile.mkdtemp(prefix="tamma_benchmark_")
+	try:
+		data_dir = args.data_dir
+		if data_dir is None:
+			data_dir = os.path.join(work_dir, "data")
+			print("writing synthetic data with {} samples in {}".format(args.samples, data_dir), file=sys.stderr)
+			write_synthetic_data(data_dir, args.samples, args.genes)
+			if args.convert:
+				subprocess.run([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "convert_data.py"), data_dir], check=True, stdout=subprocess.DEVNULL)
+
+		#the app starts with empty caches and no prebuilt figures, and is not warmed up
+		os.environ["TAMMA_DATA_URL"] = data_dir if args.local else serve_data(data_dir)
+		os.environ["TAMMA_DATA_RELEASE"] = "main"
+		os.environ["TAMMA_CACHE_DIR"] = os.path.join(work_dir, "cache")
+		os.environ["TAMMA_WARMUP"] = "0"
+		os.environ.pop("TAMMA_ARTIFACTS_DIR", None)
+		start = time.perf_counter()
+		import app
+		print("app imported in {:.0f} ms".format((time.perf_counter() - start) * 1000), file=sys.stderr)
+		client = app.server.test_client()
+
+		results = {}
+		scenarios = [scenario for scenario in get_scenarios(app, client) if args.only is None or any([scenario[0].startswith(prefix) for prefix in args.only])]
+		print("{:<60} {:>9} {:>9} {:>9} {:>9} {:>9} {:>9} {:>9}".format("scenario", "first ms", "p50 ms", "p90 ms", "p99 ms", "max ms", "peak MB", "resp KB"))
+		for name, callback, values, changed_props in scenarios:
+			result = run_scenario(app.app, client, callback, values, changed_props, args.repeat)
+			results[name] = result
+			print("{:<60} {first_ms:>9.1f} {p50_ms:>9.1f} {p90_ms:>9.1f} {p99_ms:>9.1f} {max_ms:>9.1f} {peak_mb:>9.1f} {response_kb:>9.1f}".format(name, **result))
+		if args.compression:
+			#the configured encodings and levels are marked with *
+			print("{:<60} {:>9} {:>9} {:>9} {:>9} {:>9}".format("compression", "raw KB", "comp KB", "saved %", "cpu ms", "MB/s"))
+			for name, result in run_compression(app, get_payloads(app.app, client, scenarios)).items():
+				print("{:<60} {raw_kb:>9.1f} {compressed_kb:>9.1f} {saved_pct:>9.1f} {cpu_ms:>9.1f} {mb_per_s:>9.1f}".format(name + (" *" if result["configured"] else ""), **result))
+		#ru_maxrss is in KB on linux
+		print("max rss {:.0f} MB".format(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024))
+	finally:
+		shutil.rmtree(work_dir, ignore_errors=True)
+
+	if args.output is not None:
+		with open(args.output, "w") as output_file:
+			json.dump(results, output_file, indent=1)
+	if args.baseline is not None:
+		with open(args.baseline) as baseline_file:
+			regressions = find_regressions(results, json.load(baseline_file), args.tolerance)
+		for regression in regressions:
+			print("regression: " + regression, file=sys.stderr)
+		if len(regressions) > 0:
+			sys.exit(1)
+
+if __name__ == "__main__":
+	main()
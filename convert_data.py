@@ -0,0 +1,127 @@
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+import numpy as np
+import pyarrow
+
+#convert the tsv files of a local clone of the data repository in feather files, written next to them,
+#and the per-gene counts tsv files of each dataset in a single gene by sample counts matrix
+#the app reads the converted files when they exist and falls back to the tsv files otherwise
+
+#header-less lists are read with custom column names and are never read from feather
+def is_convertible(file_name):
+	return file_name.endswith(".tsv") and not file_name.endswith("_list.tsv")
+
+#function to check if a tsv has an up-to-date feather file
+def is_converted(tsv_path):
+	feather_path = tsv_path[:-len(".tsv")] + ".feather"
+
+	return os.path.isfile(feather_path) and os.path.getmtime(feather_path) >= os.path.getmtime(tsv_path)
+
+#function to convert a tsv, returns the path of the written file or None if skipped
+def convert_tsv(tsv_path, force=False):
+	feather_path = tsv_path[:-len(".tsv")] + ".feather"
+	#up-to-date
+	if not force and is_converted(tsv_path):
+		return None
+
+	#dtypes are inferred once on the whole file and stored in the feather file
+	df = pd.read_csv(tsv_path, sep="\t", low_memory=False)
+	try:
+		df.to_feather(feather_path + ".tmp")
+	except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError) as error:
+		#mixed types in a column: the app will keep reading the tsv
+		print("skipping {}: {}".format(tsv_path, error), file=sys.stderr)
+		if os.path.isfile(feather_path + ".tmp"):
+			os.remove(feather_path + ".tmp")
+		return None
+	os.replace(feather_path + ".tmp", feather_path)
+
+	return feather_path
+
+def read_counts_samples(tsv_path):
+	return pd.read_csv(tsv_path, sep="\t", usecols=["sample"])["sample"].tolist()
+
+def read_counts_tsv(tsv_path):
+	return pd.read_csv(tsv_path, sep="\t")
+
+#function to build the counts matrix of a dataset from data/<dataset>/counts/<gene>.tsv, returns its path or None if skipped
+#the matrix is saved as data/<dataset>/counts_matrix.npy with its genes in counts_genes.tsv and its samples in counts_samples.tsv
+def build_counts_matrix(dataset_dir, executor, dtype, force=False):
+	counts_dir = os.path.join(dataset_dir, "counts")
+	file_names = sorted([file_name for file_name in os.listdir(counts_dir) if file_name.endswith(".tsv")])
+	if len(file_names) == 0:
+		return None
+	tsv_paths = [os.path.join(counts_dir, file_name) for file_name in file_names]
+	genes = [file_name[:-len(".tsv")] for file_name in file_names]
+	matrix_path = os.path.join(dataset_dir, "counts_matrix.npy")
+	genes_path = os.path.join(dataset_dir, "counts_genes.tsv")
+	#up-to-date: newer than every gene file and built from the same genes, so that deleted genes are noticed too
+	if not force and os.path.isfile(matrix_path) and os.path.isfile(genes_path) and os.path.getmtime(matrix_path) >= max([os.path.getmtime(tsv_path) for tsv_path in tsv_paths]):
+		if pd.read_csv(genes_path, sep="\t", dtype=str, keep_default_na=False)["gene"].tolist() == genes:
+			return None
+
+	#samples are the union of the samples of all genes, in order of appearance
+	samples = {}
+	for file_samples in executor.map(read_counts_samples, tsv_paths, chunksize=64):
+		for sample in file_samples:
+			samples.setdefault(sample, len(samples))
+
+	#one row per gene, samples without counts for a gene are nan; the matrix is filled on disk, one gene at a time
+	matrix = np.lib.format.open_memmap(matrix_path + ".tmp", mode="w+", dtype=dtype, shape=(len(tsv_paths), len(samples)))
+	matrix[:] = np.nan
+	for row, counts in enumerate(executor.map(read_counts_tsv, tsv_paths, chunksize=64)):
+		matrix[row, [samples[sample] for sample in counts["sample"]]] = counts["counts"].to_numpy()
+	matrix.flush()
+	del matrix
+
+	pd.DataFrame({"sample": list(samples)}).to_csv(os.path.join(dataset_dir, "counts_samples.tsv"), sep="\t", index=False)
+	os.replace(matrix_path + ".tmp", matrix_path)
+	#the gene list is written last: an interrupted build leaves the previous one, and is done again on the next run
+	pd.DataFrame({"gene": genes}).to_csv(genes_path, sep="\t", index=False)
+
+	return matrix_path
+
+def main():
+	parser = argparse.ArgumentParser(description="Convert the tsv files of a local clone of the data repository in feather files.")
+	parser.add_argument("data_dir", help="local clone of the data repository")
+	parser.add_argument("--force", action="store_true", help="convert also the files whose feather file is up-to-date")
+	parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="number of parallel conversions")
+	parser.add_argument("--counts-dtype", default="float64", choices=["float64", "float32"], help="dtype of the counts matrices, float32 halves their size")
+	args = parser.parse_args()
+
+	#counts matrices first, so that their gene and sample lists are converted too
+	with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+		datasets_dir = os.path.join(args.data_dir, "data")
+		for dataset in sorted(os.listdir(datasets_dir)):
+			if os.path.isdir(os.path.join(datasets_dir, dataset, "counts")):
+				matrix_path = build_counts_matrix(os.path.join(datasets_dir, dataset), executor, args.counts_dtype, args.force)
+				if matrix_path is not None:
+					print("{} built".format(matrix_path))
+
+	tsv_paths = []
+	for root, dirs, files in os.walk(args.data_dir):
+		#skip git internals and the per-gene counts, read from the counts matrices
+		dirs[:] = [directory for directory in dirs if not directory.startswith(".") and directory != "counts"]
+		for file_name in files:
+			if is_convertible(file_name):
+				tsv_paths.append(os.path.join(root, file_name))
+	tsv_paths.sort()
+
+	converted = 0
+	with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+		for feather_path in executor.map(convert_tsv, tsv_paths, [args.force] * len(tsv_paths), chunksize=64):
+			if feather_path is not None:
+				converted += 1
+	print("{} of {} tsv files converted".format(converted, len(tsv_paths)))
+
+	#list of the tsv files with an up-to-date feather file, the app looks for feather files only for them
+	feather_files = [os.path.relpath(tsv_path, args.data_dir).replace(os.sep, "/") for tsv_path in tsv_paths if is_converted(tsv_path)]
+	list_path = os.path.join(args.data_dir, "feather_list.tsv")
+	pd.DataFrame({"file": feather_files}).to_csv(list_path + ".tmp", sep="\t", index=False, header=False)
+	os.replace(list_path + ".tmp", list_path)
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,6 @@
+#gunicorn settings
+#each worker warms up its own caches once forked, also with --preload, where the app is imported by the master before forking
+def post_fork(server, worker):
+	import app
+
+	app.start_warm_up()
@@ -0,0 +1,27 @@
+import argparse
+import os
+
+#render the figures that depend only on the data release (snakey, metadata table and evidence panels) in json artifacts,
+#one per panel, written in <artifacts_dir>/<data release>/ and loaded by the app at startup when TAMMA_ARTIFACTS_DIR is set
+#the data repository and release are the ones of the app, set by TAMMA_DATA_URL and TAMMA_DATA_RELEASE
+
+def main():
+	parser = argparse.ArgumentParser(description="Prebuild the figures that depend only on the data release in json artifacts.")
+	parser.add_argument("artifacts_dir", help="directory of the artifacts, to be set as TAMMA_ARTIFACTS_DIR for the app")
+	parser.add_argument("--only", nargs="+", metavar="NAME", help="build only these artifacts")
+	args = parser.parse_args()
+
+	#the artifacts are built from the data, never from older artifacts, and the caches of the app are not warmed up
+	os.environ.pop("TAMMA_ARTIFACTS_DIR", None)
+	os.environ["TAMMA_WARMUP"] = "0"
+	import app
+
+	builders = app.get_artifact_builders()
+	names = args.only if args.only is not None else list(builders)
+	for name in names:
+		data, versions = app.record_data_reads(builders[name])
+		app.save_artifact(args.artifacts_dir, name, data, versions)
+		print("{} built".format(app.get_artifact_path(args.artifacts_dir, name)))
+
+if __name__ == "__main__":
+	main()